@@ -0,0 +1,172 @@
+"""Worker-side task throughput benchmark.
+
+Runs bare Celery tasks and ``FlaskCelery`` context tasks, with and without
+database access, through the in-memory broker in eager mode and in embedded
+solo/threads workers, and reports tasks/sec, per-task latency percentiles
+and allocations. Everything runs in-process, no broker or database server
+is needed::
+
+    python benchmarks/task_throughput.py --tasks 2000
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any
+from typing import Callable
+
+from celery import Celery
+from celery.app.task import Task
+from celery.contrib.testing.worker import start_worker
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fcb.app import create_app  # noqa: E402
+from fcb.app import db  # noqa: E402
+from fcb.app import tq  # noqa: E402
+
+CELERY_OVERRIDES: dict[str, Any] = {
+    'broker_url': 'memory://',
+    'broker_transport_options': {'polling_interval': 0.001},
+    # The in-memory transport only applies acks from pool threads between
+    # 2 second waits once prefetch is exhausted, so prefetch generously.
+    'worker_prefetch_multiplier': 1000,
+    'result_backend': 'cache+memory://',
+    'beat_schedule': {},
+    'worker_hijack_root_logger': False,
+}
+
+
+def make_tasks() -> dict[str, Task]:
+    """Create benchmarked tasks."""
+    flask = create_app('testing', {
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'CELERY_BEAT_SNAPSHOT_FILENAME': None,
+        **{f'CELERY_{k.upper()}': v for k, v in CELERY_OVERRIDES.items()},
+    })
+    with flask.app_context():
+        context_app = tq.celery
+
+    bare_app = Celery('bare')
+    bare_app.conf.update(CELERY_OVERRIDES)
+
+    @bare_app.task(name='bench.bare')
+    def bare() -> float:
+        return time.perf_counter()
+
+    @context_app.task(name='bench.context')
+    def context() -> float:
+        return time.perf_counter()
+
+    @context_app.task(name='bench.context_db')
+    def context_db() -> float:
+        db.session.execute(text('SELECT 1')).scalar()
+        return time.perf_counter()
+
+    return {'bare': bare, 'context': context, 'context_db': context_db}
+
+
+Run = tuple[list[float], float]
+
+
+def run_eager(task: Task, count: int) -> Run:
+    """Run task in-process, return per-task latencies & elapsed time."""
+    rv = []
+    started = time.perf_counter()
+    for _ in range(count):
+        sent = time.perf_counter()
+        task.apply().get()
+        rv.append(time.perf_counter() - sent)
+    return rv, time.perf_counter() - started
+
+
+def run_worker(task: Task, count: int, pool: str, concurrency: int) -> Run:
+    """Run task in an embedded worker, return latencies & elapsed time."""
+    with start_worker(task.app, pool=pool, concurrency=concurrency,
+                      perform_ping_check=False, loglevel='ERROR'):
+        started = time.perf_counter()
+        sent = [(time.perf_counter(), task.delay()) for _ in range(count)]
+        rv = [r.get(timeout=60, interval=0.001) - t for t, r in sent]
+        return rv, time.perf_counter() - started
+
+
+def measure_allocations(task: Task, count: int) -> dict[str, float]:
+    """Trace allocations of eager task runs."""
+    run_eager(task, min(count, 100))
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    run_eager(task, count)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    diff = after.compare_to(before, 'filename')
+    return {
+        'blocks_per_task': sum(x.count_diff for x in diff) / count,
+        'bytes_per_task': sum(x.size_diff for x in diff) / count,
+        'peak_kib': peak / 1024,
+    }
+
+
+def summarize(latencies: list[float], elapsed: float) -> dict[str, float]:
+    """Summarize latencies in milliseconds."""
+    ms = sorted(x * 1000 for x in latencies)
+    quantiles = statistics.quantiles(ms, n=100)
+    return {
+        'tasks_per_sec': len(ms) / elapsed,
+        'mean_ms': statistics.fmean(ms),
+        'p50_ms': quantiles[49],
+        'p90_ms': quantiles[89],
+        'p99_ms': quantiles[98],
+        'max_ms': ms[-1],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=2000,
+                        help='tasks per run')
+    parser.add_argument('--modes', default='eager,solo,threads',
+                        help='comma separated modes')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='threads pool concurrency')
+    parser.add_argument('--json', action='store_true',
+                        help='print results as JSON')
+    args = parser.parse_args()
+
+    tasks = make_tasks()
+    runners: dict[str, Callable[[Task, int], Run]] = {
+        'eager': run_eager,
+        'solo': lambda t, n: run_worker(t, n, 'solo', 1),
+        'threads': lambda t, n: run_worker(t, n, 'threads',
+                                           args.concurrency),
+    }
+
+    results = []
+    for mode in args.modes.split(','):
+        for name, task in tasks.items():
+            latencies, elapsed = runners[mode](task, args.tasks)
+            results.append({'mode': mode, 'task': name,
+                            **summarize(latencies, elapsed)})
+    for name, task in tasks.items():
+        results.append({'mode': 'alloc', 'task': name,
+                        **measure_allocations(task, args.tasks)})
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for row in results:
+        values = '  '.join(f'{k}={v:.3f}' for k, v in row.items()
+                           if isinstance(v, float))
+        print(f'{row["mode"]:<8} {row["task"]:<11} {values}')
+
+
+if __name__ == '__main__':
+    main()
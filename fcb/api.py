@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any
+
+from flask import Blueprint
+from flask import Response
+from flask import abort
+from flask import current_app
+from flask import jsonify
+from flask import request
+from sqlalchemy.orm import joinedload
+
+from fcb.claim_check import encode_arguments
+from fcb.models import PeriodicTask
+from fcb.models import PeriodicTasks
+from fcb.models import read_session
+
+bp = Blueprint('api', __name__, url_prefix='/api')
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+LISTING_CACHE_SIZE = 256
+
+SCHEDULE_TYPES = ('crontab', 'interval', 'solar')
+
+_listing_cache: OrderedDict[str, bytes] = OrderedDict()
+_listing_lock = threading.Lock()
+
+
+@bp.get('/periodic-tasks')
+def list_periodic_tasks() -> Response:
+    """List periodic task definitions.
+
+    Query parameters: ``queue``, ``enabled``, ``schedule`` (``crontab``,
+    ``interval`` or ``solar``), ``after`` (name cursor) and ``limit``.
+
+    Task arguments are listed by encoded size and SHA-256 digest only, the
+    digest being the claim check key of claim-checked arguments.
+
+    Responses carry an ETag derived from ``PeriodicTasks.changed_at``, so
+    run bookkeeping (``last_run_at``, counters), which does not bump it, is
+    left out of the listing.
+    """
+    args = _listing_args()
+    with read_session() as session:
+        changed_at = session.query(PeriodicTasks.changed_at) \
+            .filter_by(id=1).scalar()
+    key = '{0}|{1}'.format(
+        changed_at.isoformat() if changed_at else '',
+        '&'.join(f'{k}={v}' for k, v in sorted(args.items())),
+    )
+    etag = hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        with _listing_lock:
+            body = _listing_cache.get(etag)
+            if body is not None:
+                _listing_cache.move_to_end(etag)
+        if body is None:
+            body = jsonify(_query_listing(**args)).get_data()
+            with _listing_lock:
+                _listing_cache[etag] = body
+                while len(_listing_cache) > LISTING_CACHE_SIZE:
+                    _listing_cache.popitem(last=False)
+        response = current_app.response_class(
+            body, mimetype='application/json')
+
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+
+def _listing_args() -> dict[str, Any]:
+    """Parse listing query parameters."""
+    args: dict[str, Any] = {}
+    if 'queue' in request.args:
+        args['queue'] = request.args['queue']
+    if 'enabled' in request.args:
+        args['enabled'] = request.args['enabled'].lower() in (
+            '1', 'true', 'yes', 'on')
+    if 'schedule' in request.args:
+        args['schedule'] = request.args['schedule']
+        if args['schedule'] not in SCHEDULE_TYPES:
+            abort(400, f'schedule must be one of {", ".join(SCHEDULE_TYPES)}')
+    if 'after' in request.args:
+        args['after'] = request.args['after']
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    args['limit'] = max(1, min(limit, MAX_PAGE_SIZE))
+    return args
+
+
+def _query_listing(
+        limit: int,
+        queue: str | None = None,
+        enabled: bool | None = None,
+        schedule: str | None = None,
+        after: str | None = None,
+) -> dict[str, Any]:
+    """Query a page of periodic tasks ordered by name."""
+    with read_session() as session:
+        query = session.query(PeriodicTask).options(
+            joinedload(PeriodicTask.crontab),
+            joinedload(PeriodicTask.interval),
+            joinedload(PeriodicTask.solar),
+        )
+        if queue is not None:
+            query = query.filter(PeriodicTask.queue == queue)
+        if enabled is not None:
+            query = query.filter(PeriodicTask.is_enabled.is_(enabled))
+        if schedule is not None:
+            column = getattr(PeriodicTask, f'{schedule}_id')
+            query = query.filter(column.isnot(None))
+        if after is not None:
+            query = query.filter(PeriodicTask.name > after)
+
+        rows = query.order_by(PeriodicTask.name).limit(limit + 1).all()
+        items = [_dump_task(x) for x in rows[:limit]]
+
+    return {
+        'items': items,
+        'next': items[-1]['name'] if len(rows) > limit else None,
+    }
+
+
+def _dump_task(task: PeriodicTask) -> dict[str, Any]:
+    """Dump periodic task definition."""
+    return {
+        'id': task.id.hex,
+        'name': task.name,
+        'desc': task.desc,
+        'is_preset': task.is_preset,
+        'is_enabled': task.is_enabled,
+        'task_name': task.task_name,
+        'arguments': _dump_arguments(task),
+        'queue': task.queue,
+        'exchange': task.exchange,
+        'routing_key': task.routing_key,
+        'priority': task.priority,
+        'expires': task.expires,
+        'start_at': task.start_at.isoformat() if task.start_at else None,
+        'overlap_policy': task.overlap_policy,
+        'schedule': _dump_schedule(task),
+    }
+
+
+def _dump_arguments(task: PeriodicTask) -> dict[str, Any]:
+    """Dump size & digest of task arguments, which may hold secrets."""
+    payload = encode_arguments(task.task_args, task.task_kwargs)
+    return {
+        'size': len(payload),
+        'digest': hashlib.sha256(payload).hexdigest(),
+    }
+
+
+def _dump_schedule(task: PeriodicTask) -> dict[str, Any] | None:
+    """Dump schedule fields of periodic task."""
+    if task.interval:
+        return {
+            'type': 'interval',
+            'every': task.interval.every,
+            'period': task.interval.period,
+        }
+    elif task.crontab:
+        return {
+            'type': 'crontab',
+            'minute': task.crontab.minute,
+            'hour': task.crontab.hour,
+            'day_of_week': task.crontab.day_of_week,
+            'day_of_month': task.crontab.day_of_month,
+            'month_of_year': task.crontab.month_of_year,
+        }
+    elif task.solar:
+        return {
+            'type': 'solar',
+            'event': task.solar.event,
+            'latitude': float(task.solar.latitude),
+            'longitude': float(task.solar.longitude),
+        }
+    return None
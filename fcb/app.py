@@ -11,7 +11,7 @@ from sqlalchemy.orm import Mapper
 from fcb.config import config_map
 from fcb.ext.celery import FlaskCelery
 
-db = SQLAlchemy()
+db: Any = SQLAlchemy()
 tq = FlaskCelery()
 
 
@@ -36,6 +36,9 @@ def create_app(
 
     importlib.import_module('fcb.models')
     importlib.import_module('fcb.tasks')
+    _initialize_stores(app)
+    _register_commands(app)
+    _register_blueprints(app)
 
     return app
 
@@ -63,6 +66,30 @@ def _initialize_extensions(app: Flask) -> None:
     tq.init_app(app)
 
 
+def _initialize_stores(app: Flask) -> None:
+    """Initialize stores shared by BEAT and workers."""
+    from fcb import claim_check
+    from fcb import leases
+
+    leases.init_app(app)
+    claim_check.init_app(app)
+
+
+def _register_commands(app: Flask) -> None:
+    """Register CLI commands."""
+    from fcb.commands import forecast_command
+
+    app.cli.add_command(forecast_command)
+
+
+def _register_blueprints(app: Flask) -> None:
+    """Register blueprints."""
+    from fcb.api import bp as api_bp
+
+    if app.config.get('API_ENABLED'):
+        app.register_blueprint(api_bp)
+
+
 def _make_shell_context(app: Flask) -> None:
     """Make python shell context."""
 
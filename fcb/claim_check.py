@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from typing import Any
+from typing import Iterable
+
+from flask import Flask
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from fcb.app import db
+from fcb.models import TaskPayload
+
+__all__ = [
+    'CLAIM_CHECK_HEADER',
+    'PayloadStore', 'DatabasePayloadStore', 'FilePayloadStore',
+    'ClaimCheck', 'encode_arguments', 'init_app',
+]
+
+#: Message header carrying the payload digest of claim-checked arguments
+CLAIM_CHECK_HEADER = 'claim_check'
+
+Arguments = tuple[list[Any], dict[str, Any]]
+
+
+def encode_arguments(args: Any, kwargs: Any) -> bytes:
+    """Encode task arguments as claim check payload.
+
+    :param args: task positional arguments
+    :param kwargs: task keyword arguments
+    :return: canonical JSON payload, its SHA-256 digest is the payload key
+    """
+    return json.dumps(
+        {'args': list(args or ()), 'kwargs': dict(kwargs or {})},
+        sort_keys=True, separators=(',', ':'),
+    ).encode('utf-8')
+
+
+class PayloadStore:
+    """Abstract store of task argument payloads keyed by SHA-256 digest."""
+
+    def put(self, digest: str, payload: bytes) -> None:
+        """Store payload, if not stored yet.
+
+        :param digest: payload digest
+        :param payload: encoded arguments
+        """
+        raise NotImplementedError()
+
+    def get(self, digest: str) -> bytes | None:
+        """Get payload.
+
+        :param digest: payload digest
+        :return: encoded arguments, ``None`` if missing
+        """
+        raise NotImplementedError()
+
+    def prune(self, keep: set[str], before: datetime) -> int:
+        """Delete payloads not referenced since given time.
+
+        Payloads to keep are marked as referenced now.
+
+        :param keep: digests of referenced payloads
+        :param before: naive UTC datetime
+        :return: number of deleted payloads
+        """
+        raise NotImplementedError()
+
+
+class DatabasePayloadStore(PayloadStore):
+    """Payload store backed by the ``task_payload`` table.
+
+    :param app: Flask application
+    """
+
+    def __init__(self, app: Flask) -> None:
+        self.app = app
+
+    def put(self, digest: str, payload: bytes) -> None:
+        t = TaskPayload.__table__
+        try:
+            with db.get_engine(self.app).begin() as cnn:
+                exists = cnn.execute(
+                    select(t.c.digest).where(t.c.digest == digest)
+                ).scalar()
+                if not exists:
+                    cnn.execute(t.insert().values(
+                        digest=digest, payload=payload,
+                        created_at=datetime.utcnow(),
+                    ))
+        except IntegrityError:
+            pass  # stored concurrently
+
+    def get(self, digest: str) -> bytes | None:
+        t = TaskPayload.__table__
+        with db.get_engine(self.app).connect() as cnn:
+            return cnn.execute(
+                select(t.c.payload).where(t.c.digest == digest)
+            ).scalar()
+
+    def prune(self, keep: set[str], before: datetime) -> int:
+        t = TaskPayload.__table__
+        with db.get_engine(self.app).begin() as cnn:
+            if keep:
+                cnn.execute(t.update().where(t.c.digest.in_(keep)).values(
+                    created_at=datetime.utcnow()))
+            return cnn.execute(t.delete().where(
+                t.c.created_at < before, t.c.digest.notin_(keep),
+            )).rowcount
+
+
+class FilePayloadStore(PayloadStore):
+    """Payload store keeping one file per payload.
+
+    The folder must be shared by BEAT and the workers.
+
+    :param folder: payload folder
+    """
+
+    def __init__(self, folder: str) -> None:
+        self.folder = folder
+
+    def put(self, digest: str, payload: bytes) -> None:
+        path = self._path(digest)
+        if os.path.exists(path):
+            return
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def get(self, digest: str) -> bytes | None:
+        try:
+            with open(self._path(digest), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def prune(self, keep: set[str], before: datetime) -> int:
+        timestamp = before.replace(tzinfo=timezone.utc).timestamp()
+        count = 0
+        for root, _, files in os.walk(self.folder):
+            for name in files:
+                digest, ext = os.path.splitext(name)
+                if ext != '.json':
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    if digest in keep:
+                        os.utime(path)
+                    elif os.path.getmtime(path) < timestamp:
+                        os.unlink(path)
+                        count += 1
+                except FileNotFoundError:
+                    pass  # pruned concurrently
+        return count
+
+    def _path(self, digest: str) -> str:
+        """Get payload file path."""
+        return os.path.join(self.folder, digest[:2], digest + '.json')
+
+
+class ClaimCheck:
+    """Claim check of large task arguments.
+
+    BEAT stores arguments whose encoded size reaches the threshold and sends
+    their digest in a message header instead, workers resolve the digest
+    back to the arguments through a per-process LRU cache of payloads.
+
+    :param store: payload store
+    :param threshold: optional minimum payload size in bytes to claim-check,
+        ``None`` to send arguments as they are
+    :param cache_size: number of payloads cached by workers
+    :param expires: optional seconds to keep payloads no longer referenced
+        by a periodic task, ``None`` to keep them
+    """
+
+    def __init__(
+            self,
+            store: PayloadStore,
+            threshold: int | None = None,
+            cache_size: int = 128,
+            expires: int | None = None,
+    ) -> None:
+        self.store = store
+        self.threshold = threshold
+        self.cache_size = cache_size
+        self.expires = expires
+        self._cache: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, args: Any, kwargs: Any) -> str | None:
+        """Store arguments if large enough.
+
+        :param args: task positional arguments
+        :param kwargs: task keyword arguments
+        :return: payload digest, ``None`` if arguments are sent as they are
+        """
+        if self.threshold is None or (not args and not kwargs):
+            return None
+
+        payload = encode_arguments(args, kwargs)
+        if len(payload) < self.threshold:
+            return None
+
+        digest = hashlib.sha256(payload).hexdigest()
+        with self._lock:
+            stored = digest in self._cache
+        if not stored:
+            self.store.put(digest, payload)
+            self._remember(digest, payload)
+        return digest
+
+    def prune(self, arguments: Iterable[Arguments]) -> int:
+        """Delete payloads not referenced for longer than ``expires``.
+
+        :param arguments: positional & keyword arguments of every periodic
+            task
+        :return: number of deleted payloads
+        """
+        if self.threshold is None or self.expires is None:
+            return 0
+
+        keep = {
+            hashlib.sha256(encode_arguments(args, kwargs)).hexdigest()
+            for args, kwargs in arguments
+        }
+        before = datetime.utcnow() - timedelta(seconds=self.expires)
+        count = self.store.prune(keep, before)
+        with self._lock:
+            # Cached digests are not stored again, drop the pruned ones.
+            for digest in [x for x in self._cache if x not in keep]:
+                del self._cache[digest]
+        return count
+
+    def resolve(self, digest: str) -> Arguments:
+        """Get claim-checked arguments.
+
+        :param digest: payload digest
+        :return: task positional & keyword arguments
+        """
+        with self._lock:
+            payload = self._cache.get(digest)
+            if payload is not None:
+                self._cache.move_to_end(digest)
+        if payload is None:
+            payload = self.store.get(digest)
+            if payload is None:
+                raise LookupError(f'Task payload {digest} not found')
+            self._remember(digest, payload)
+
+        data = json.loads(payload)
+        return data['args'], data['kwargs']
+
+    def resolve_request(
+            self,
+            request: Any,
+            args: tuple[Any, ...],
+            kwargs: dict[str, Any],
+    ) -> tuple[Any, dict[str, Any]]:
+        """Resolve arguments of a Celery task request, if claim-checked.
+
+        :param request: Celery task request
+        :param args: task positional arguments
+        :param kwargs: task keyword arguments
+        :return: task positional & keyword arguments
+        """
+        digest = _request_digest(request)
+        if not digest:
+            return args, kwargs
+
+        stored_args, stored_kwargs = self.resolve(digest)
+        return [*stored_args, *args], {**stored_kwargs, **kwargs}
+
+    def request_headers(self, request: Any) -> dict[str, Any]:
+        """Get claim check header of a Celery task request, for retries.
+
+        :param request: Celery task request
+        :return: message headers
+        """
+        digest = _request_digest(request)
+        return {CLAIM_CHECK_HEADER: digest} if digest else {}
+
+    def _remember(self, digest: str, payload: bytes) -> None:
+        """Cache payload."""
+        with self._lock:
+            self._cache[digest] = payload
+            self._cache.move_to_end(digest)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+
+def _request_digest(request: Any) -> str | None:
+    """Get payload digest of a claim-checked Celery task request."""
+    headers = getattr(request, 'headers', None) or {}
+    return getattr(request, CLAIM_CHECK_HEADER, None) \
+        or headers.get(CLAIM_CHECK_HEADER)
+
+
+def init_app(app: Flask) -> None:
+    """Initialize claim check of Flask application.
+
+    :param app: Flask application
+    """
+    folder = app.config.get('CELERY_CLAIM_CHECK_FOLDER')
+    store = FilePayloadStore(os.path.join(app.instance_path, folder)) \
+        if folder else DatabasePayloadStore(app)
+    app.extensions['claim_check'] = ClaimCheck(
+        store,
+        threshold=app.config.get('CELERY_CLAIM_CHECK_THRESHOLD'),
+        cache_size=app.config.get('CELERY_CLAIM_CHECK_CACHE_SIZE') or 128,
+        expires=app.config.get('CELERY_CLAIM_CHECK_EXPIRES'),
+    )
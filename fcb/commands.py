@@ -0,0 +1,42 @@
+import json
+from typing import Any
+from typing import Callable
+from typing import TypeVar
+from typing import cast
+
+import click
+from flask.cli import with_appcontext
+
+from fcb.forecast import forecast_load
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+
+def _with_appcontext(f: F) -> F:
+    """Typed :func:`flask.cli.with_appcontext`."""
+    return cast(F, with_appcontext(f))
+
+
+@click.command('forecast')
+@click.option('--hours', default=24.0, show_default=True,
+              help='Forecast horizon in hours.')
+@click.option('--top', default=10, show_default=True,
+              help='Number of hotspot minutes to show.')
+@click.option('--as-json', is_flag=True, help='Dump full histogram as JSON.')
+@_with_appcontext
+def forecast_command(hours: float, top: int, as_json: bool) -> None:
+    """Forecast per-minute periodic task load."""
+    forecast = forecast_load(hours=hours)
+
+    if as_json:
+        click.echo(json.dumps(forecast.as_dict(top=top)))
+        return
+
+    click.echo(f'Forecast from {forecast.start:%Y-%m-%d %H:%M} UTC, '
+               f'{forecast.minutes} minutes')
+    for queue, total in sorted(forecast.totals().items()):
+        peak = max(forecast.histogram[queue])
+        click.echo(f'  {queue}: {total} fires, peak {peak}/min')
+    click.echo('Hotspots:')
+    for minute, queue, count in forecast.hotspots(top):
+        click.echo(f'  {minute:%Y-%m-%d %H:%M}  {queue}  {count}')
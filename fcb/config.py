@@ -13,6 +13,9 @@ class BaseConfig:
     DEBUG: bool = False
     #: Testing mode
     TESTING: bool = False
+    #: Whether to serve the ``/api`` listing, which has no authentication of
+    #: its own and should only be enabled behind one
+    API_ENABLED: bool = False
 
     #: SQLAlchemy database URI
     SQLALCHEMY_DATABASE_URI: str = 'sqlite:///:memory:'
@@ -22,6 +25,10 @@ class BaseConfig:
     SQLALCHEMY_RECORD_QUERIES: bool = True
     #: Slow query duration
     SQLALCHEMY_SLOW_QUERY: int | float = 0.5
+    #: Optional bind key (in ``SQLALCHEMY_BINDS``) for schedule reads
+    SQLALCHEMY_READ_BIND: str | None = None
+    #: Seconds to read from primary after a schedule change
+    SQLALCHEMY_READ_YOUR_WRITES: int | float = 5
 
     #: Celery broker URL
     CELERY_BROKER_URL: str = 'redis://localhost:6379/0'
@@ -38,6 +45,44 @@ class BaseConfig:
     }
     #: Celery BEAT scheduler path
     CELERY_BEAT_SCHEDULER: str = 'fcb.schedulers:DatabaseScheduler'
+    #: Days of solar events precomputed by BEAT scheduler
+    CELERY_BEAT_SOLAR_CACHE_DAYS: int = 2
+    #: BEAT schedule snapshot file in instance folder, ``None`` to disable
+    CELERY_BEAT_SNAPSHOT_FILENAME: str | None = 'beat-schedule.json'
+    #: Optional Redis URL of run lease store, database store if not set
+    CELERY_BEAT_LEASE_URL: str | None = None
+    #: Run lease expiration of tasks without ``expires``, in seconds
+    CELERY_BEAT_LEASE_TTL: int = 3600
+    #: BEAT dispatch threads for publishing & bookkeeping, 0 to dispatch in
+    #: the BEAT loop
+    CELERY_BEAT_DISPATCH_WORKERS: int = 0
+    #: Maximum number of queued dispatches per BEAT dispatch thread
+    CELERY_BEAT_DISPATCH_QUEUE_SIZE: int = 100
+    #: Message compression per queue name, e.g. ``{'reports': 'zlib'}``
+    CELERY_BEAT_QUEUE_COMPRESSION: dict[str, str] = {}
+    #: Minimum encoded size in bytes of periodic task arguments to store
+    #: apart from messages, ``None`` to disable claim check
+    CELERY_CLAIM_CHECK_THRESHOLD: int | None = None
+    #: Claim check payload folder in instance folder, database if not set
+    CELERY_CLAIM_CHECK_FOLDER: str | None = None
+    #: Number of claim check payloads cached per process
+    CELERY_CLAIM_CHECK_CACHE_SIZE: int = 128
+    #: Seconds to keep claim check payloads no longer referenced by a
+    #: periodic task, ``None`` to keep them; must exceed the time messages
+    #: and their retries may wait in queues
+    CELERY_CLAIM_CHECK_EXPIRES: int | None = 7 * 24 * 3600
+    #: Fraction of task invocations to profile
+    CELERY_TASK_PROFILE_RATE: float = 0.0
+    #: Names of tasks to profile on every invocation
+    CELERY_TASK_PROFILE_TASKS: list[str] = []
+    #: Task profilers to run: ``cpu`` (cProfile) and/or ``memory``
+    CELERY_TASK_PROFILE_MODES: list[str] = ['cpu']
+    #: Task profile folder in instance folder
+    CELERY_TASK_PROFILE_FOLDER: str = 'profiles'
+    #: Maximum total size of task profile folder in bytes
+    CELERY_TASK_PROFILE_MAX_BYTES: int = 50 * 1024 * 1024
+    #: Rows per bulk statement of task units of work
+    CELERY_TASK_BULK_CHUNK_SIZE: int = 1000
 
     #: Extra config file in instance folder
     EXTRA_INSTANCE_CONFIG: str = 'config.py'
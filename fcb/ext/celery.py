@@ -1,10 +1,29 @@
+from __future__ import annotations
+
+import time
+from collections import Counter
+from collections import deque
 from typing import Any
+from typing import Iterable
+from typing import Iterator
+from typing import Mapping
 
 from celery import Celery
+from celery import states
 from celery.app.task import Task as BaseTask
+from celery.result import AsyncResult
+from celery.utils import uuid
 from flask import Flask
 from flask import current_app
 from flask import has_app_context
+from sqlalchemy.orm import Query
+from sqlalchemy.orm import Session
+
+from fcb.utils.profiling import TaskProfiler
+
+KeyRange = tuple[Any, Any]
+
+DEFAULT_FAN_OUT_TIMEOUT = 3600  # seconds
 
 
 class FlaskCelery:
@@ -32,6 +51,7 @@ class FlaskCelery:
 
         :param app: Flask application
         """
+        profiler = TaskProfiler.from_app(app)
 
         class ContextTask(BaseTask):
             """Celery task within Flask context."""
@@ -40,10 +60,124 @@ class FlaskCelery:
                 raise NotImplementedError()
 
             def __call__(self, *args: Any, **kwargs: Any) -> Any:
+                if profiler is not None and profiler.should_sample(self.name):
+                    with profiler.profile(self.name, self.request.id):
+                        return self._call_in_context(*args, **kwargs)
+                return self._call_in_context(*args, **kwargs)
+
+            def _call_in_context(self, *args: Any, **kwargs: Any) -> Any:
                 if has_app_context():
-                    return super().__call__(*args, **kwargs)
+                    return self._call_resolved(args, kwargs)
                 with app.app_context():
-                    return super().__call__(*args, **kwargs)
+                    return self._call_resolved(args, kwargs)
+
+            def _call_resolved(
+                    self,
+                    args: tuple[Any, ...],
+                    kwargs: dict[str, Any],
+            ) -> Any:
+                claim_check = app.extensions.get('claim_check')
+                if claim_check is not None:
+                    args, kwargs = claim_check.resolve_request(
+                        self.request, args, kwargs)
+                return super().__call__(*args, **kwargs)
+
+            def after_return(
+                    self,
+                    status: str,
+                    retval: Any,
+                    task_id: str,
+                    args: tuple[Any, ...],
+                    kwargs: dict[str, Any],
+                    einfo: Any,
+            ) -> None:
+                leases = app.extensions.get('leases')
+                if leases is not None and status != states.RETRY:
+                    leases.release_request(self.request)
+
+            def apply_async(
+                    self,
+                    args: Any = None,
+                    kwargs: Any = None,
+                    task_id: str | None = None,
+                    producer: Any = None,
+                    link: Any = None,
+                    link_error: Any = None,
+                    shadow: str | None = None,
+                    **options: Any,
+            ) -> Any:
+                from fcb.claim_check import CLAIM_CHECK_HEADER
+
+                headers = options.get('headers') or {}
+                if not self.typing or not headers.get(CLAIM_CHECK_HEADER):
+                    return super().apply_async(
+                        args, kwargs, task_id, producer, link, link_error,
+                        shadow, **options)
+
+                # Claim-checked arguments are only known to the worker, so
+                # they cannot be checked against the task signature here.
+                options = dict(self._get_exec_options(), **options)
+                options.setdefault('ignore_result', self.ignore_result)
+                if self.priority:
+                    options.setdefault('priority', self.priority)
+                if self.app.conf.task_always_eager:
+                    return self.apply(
+                        args, kwargs, task_id=task_id or uuid(), link=link,
+                        link_error=link_error, **options)
+                return self.app.send_task(
+                    self.name, args, kwargs, task_id=task_id,
+                    producer=producer, link=link, link_error=link_error,
+                    result_cls=self.AsyncResult,
+                    shadow=shadow or self.shadow_name(args, kwargs, options),
+                    task_type=self, **options)
+
+            def signature_from_request(
+                    self,
+                    request: Any = None,
+                    *args: Any,
+                    **kwargs: Any,
+            ) -> Any:
+                # Custom headers are request attributes in workers, so they
+                # are not part of the retried message otherwise.
+                request = self.request if request is None else request
+                sig = super().signature_from_request(request, *args, **kwargs)
+                headers: dict[str, Any] = {}
+                for name in ('leases', 'claim_check'):
+                    store = app.extensions.get(name)
+                    if store is not None:
+                        headers.update(store.request_headers(request))
+                if headers:
+                    sig.options['headers'] = {
+                        **(sig.options.get('headers') or {}), **headers,
+                    }
+                return sig
+
+            def fan_out(
+                    self,
+                    chunk: BaseTask,
+                    ranges: Iterable[KeyRange],
+                    **kwargs: Any,
+            ) -> dict[str, Any]:
+                """Run chunk subtasks from this task, see :func:`fan_out`.
+
+                Waits at most the time limit of this task, if any.
+                """
+                limits = [x for x in (
+                    *(self.request.timelimit or ()),
+                    self.soft_time_limit or self.app.conf.task_soft_time_limit,
+                    self.time_limit or self.app.conf.task_time_limit,
+                ) if x]
+                if limits:
+                    kwargs.setdefault('timeout', min(limits))
+                return fan_out(chunk, ranges, **kwargs)
+
+            def unit_of_work(self, **kwargs: Any) -> UnitOfWork:
+                """Open a unit of work for this task, see :class:`UnitOfWork`."""
+                kwargs.setdefault(
+                    'chunk_size',
+                    app.config.get('CELERY_TASK_BULK_CHUNK_SIZE') or 1000,
+                )
+                return UnitOfWork(**kwargs)
 
         client = Celery(app.import_name, task_cls=ContextTask)
         client.conf.update(app.config.get_namespace('CELERY_'))
@@ -51,6 +185,239 @@ class FlaskCelery:
         app.extensions['celery'] = _CeleryState(client)
 
 
+def key_ranges(start: int, stop: int, size: int) -> Iterator[KeyRange]:
+    """Split integer key range ``[start, stop)`` into chunks.
+
+    :param start: first key
+    :param stop: key after the last one
+    :param size: chunk size
+    :return: ``(lower, upper)`` chunks, lower inclusive & upper exclusive
+    """
+    for lower in range(start, stop, size):
+        yield lower, min(lower + size, stop)
+
+
+def keyset_ranges(query: Query, column: Any, size: int) -> Iterator[KeyRange]:
+    """Split query rows into keyset chunks of a unique, ordered column.
+
+    Only the key column is read, one boundary row per chunk, so the ranges
+    can be computed up front without loading the rows themselves.
+
+    :param query: SQLAlchemy query of rows to process
+    :param column: unique key column
+    :param size: chunk size
+    :return: ``(lower, upper)`` chunks, lower exclusive & upper inclusive,
+        ``None`` meaning unbounded
+    """
+    keys = query.with_entities(column).order_by(column)
+    lower = None
+    while True:
+        q = keys if lower is None else keys.filter(column > lower)
+        upper = q.offset(size - 1).limit(1).scalar()
+        if upper is None:
+            if q.limit(1).scalar() is not None:
+                yield lower, None
+            return
+        yield lower, upper
+        lower = upper
+
+
+def keyset_filter(query: Query, column: Any, lower: Any, upper: Any) -> Query:
+    """Filter query to a chunk produced by :func:`keyset_ranges`.
+
+    :param query: SQLAlchemy query
+    :param column: key column
+    :param lower: exclusive lower bound or ``None``
+    :param upper: inclusive upper bound or ``None``
+    :return: filtered query
+    """
+    if lower is not None:
+        query = query.filter(column > lower)
+    if upper is not None:
+        query = query.filter(column <= upper)
+    return query
+
+
+def fan_out(
+        chunk: BaseTask,
+        ranges: Iterable[KeyRange],
+        args: Iterable[Any] = (),
+        kwargs: dict[str, Any] | None = None,
+        max_in_flight: int = 8,
+        interval: float = 0.5,
+        timeout: float | None = DEFAULT_FAN_OUT_TIMEOUT,
+        **options: Any,
+) -> dict[str, Any]:
+    """Split a job into chunk subtasks and wait for them.
+
+    Each chunk is sent as ``chunk.apply_async((lower, upper, *args), kwargs)``
+    with at most ``max_in_flight`` chunks queued or running at a time.
+    Chunks may return a dict of numbers, which are summed into ``totals``.
+    Waiting for subtasks needs a result backend and keeps the calling worker
+    busy, so run the driving task on a queue of its own.
+
+    :param chunk: chunk task
+    :param ranges: chunk key ranges
+    :param args: optional extra chunk arguments
+    :param kwargs: optional chunk keyword arguments
+    :param max_in_flight: maximum number of pending chunks
+    :param interval: seconds between polls of pending chunks
+    :param timeout: seconds to wait for all chunks, ``None`` to wait forever
+    :param options: optional ``apply_async`` options
+    :return: chunk stats
+    """
+    started = time.monotonic()
+    deadline = started + timeout if timeout is not None else None
+    pending: deque[AsyncResult] = deque()
+    totals: Counter[str] = Counter()
+    stats = {'chunks': 0, 'succeeded': 0, 'failed': 0}
+
+    def collect(block: bool) -> None:
+        while pending and (block or len(pending) >= max_in_flight):
+            ready = [x for x in pending if x.ready()]
+            if not ready:
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TimeoutError(f'{len(pending)} chunks pending')
+                time.sleep(interval)
+                continue
+            for result in ready:
+                pending.remove(result)
+                if result.successful():
+                    stats['succeeded'] += 1
+                    value = result.result
+                    if isinstance(value, dict):
+                        totals.update({k: v for k, v in value.items()
+                                       if isinstance(v, (int, float))})
+                else:
+                    stats['failed'] += 1
+
+    for lower, upper in ranges:
+        collect(block=False)
+        pending.append(chunk.apply_async(
+            (lower, upper, *args), kwargs, **options))
+        stats['chunks'] += 1
+    collect(block=True)
+
+    return dict(stats, totals=dict(totals),
+                elapsed=time.monotonic() - started)
+
+
+class UnitOfWork:
+    """Task-scoped database session buffering bulk writes.
+
+    Rows added with :meth:`insert` and :meth:`update` are buffered per model
+    and written with ``bulk_insert_mappings`` / ``bulk_update_mappings`` once
+    ``chunk_size`` rows are buffered, and the rest at the end. Buffers are
+    always written in the order they were first used, and a full buffer is
+    written after every buffer opened before it, so add parent rows before
+    the rows referencing them. Used as a context manager, the work is
+    committed on success and rolled back on any exception, including
+    ``Retry``, and the session is closed either way::
+
+        with self.unit_of_work() as uow:
+            for row in rows:
+                uow.insert(Model, row)
+
+    :param db: optional Flask-SQLAlchemy extension, the application's one
+        by default
+    :param chunk_size: number of buffered rows per bulk statement
+    :param commit_per_chunk: commit after every chunk instead of at the end
+    """
+
+    session: Session
+
+    def __init__(
+            self,
+            db: Any = None,
+            chunk_size: int = 1000,
+            commit_per_chunk: bool = False,
+    ) -> None:
+        db = db or current_app.extensions['sqlalchemy'].db
+        self.session = db.create_session({})()
+        self.chunk_size = chunk_size
+        self.commit_per_chunk = commit_per_chunk
+        self.counts: Counter[str] = Counter()
+        self._buffers: dict[tuple[str, type], list[Mapping[str, Any]]] = {}
+
+    def insert(self, model: type, row: Mapping[str, Any]) -> None:
+        """Buffer a row insert.
+
+        :param model: model class
+        :param row: column values
+        """
+        self._buffer('insert', model, row)
+
+    def update(self, model: type, row: Mapping[str, Any]) -> None:
+        """Buffer a row update.
+
+        :param model: model class
+        :param row: column values, including the primary key
+        """
+        self._buffer('update', model, row)
+
+    def flush(self) -> None:
+        """Write all buffered rows."""
+        for key in list(self._buffers):
+            self._write(key)
+
+    def commit(self) -> None:
+        """Write all buffered rows and commit."""
+        self.flush()
+        self.session.commit()
+
+    def rollback(self) -> None:
+        """Discard buffered rows and roll back."""
+        self._buffers.clear()
+        self.session.rollback()
+
+    def close(self) -> None:
+        """Discard buffered rows and close session."""
+        self._buffers.clear()
+        self.session.close()
+
+    def __enter__(self) -> UnitOfWork:
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        try:
+            if exc_type is None:
+                self.commit()
+            else:
+                self.rollback()
+        except BaseException:
+            self.session.rollback()
+            raise
+        finally:
+            self.close()
+
+    def _buffer(self, kind: str, model: type, row: Mapping[str, Any]) -> None:
+        """Buffer a row, writing buffers up to its own when full."""
+        key = kind, model
+        rows = self._buffers.setdefault(key, [])
+        rows.append(row)
+        if len(rows) >= self.chunk_size:
+            for k in list(self._buffers):
+                self._write(k)
+                if k == key:
+                    break
+
+    def _write(self, key: tuple[str, type]) -> None:
+        """Write a buffer."""
+        rows = self._buffers.get(key)
+        if not rows:
+            return
+        self._buffers[key] = []
+
+        kind, model = key
+        if kind == 'insert':
+            self.session.bulk_insert_mappings(model, rows)
+        else:
+            self.session.bulk_update_mappings(model, rows)
+        self.counts[kind] += len(rows)
+        if self.commit_per_chunk:
+            self.session.commit()
+
+
 class _CeleryState:
     """Flask celery extension state.
 
@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import heapq
+from collections import Counter
+from datetime import datetime
+from datetime import timedelta
+from typing import Any
+from typing import Iterable
+
+import pytz
+from celery import current_app as celery_app
+from celery import schedules
+from flask import current_app
+from sqlalchemy import select
+
+from fcb.app import db
+from fcb.models import CrontabSchedule
+from fcb.models import IntervalSchedule
+from fcb.models import PeriodicTask
+from fcb.models import SolarSchedule
+from fcb.schedulers import local_to_utc
+from fcb.utils.solar import solar_cache
+
+__all__ = [
+    'LoadForecast', 'forecast_load', 'next_fire_times',
+]
+
+CronSpec = tuple[str, str, str, str, str]
+
+#: Farthest ahead :func:`next_fire_times` looks for crontab & solar fires
+MAX_HORIZON = timedelta(days=5 * 366)
+
+
+class LoadForecast:
+    """Per-queue, per-minute histogram of upcoming task fires.
+
+    :param start: naive UTC start time, aligned to the minute
+    :param minutes: horizon length in minutes
+    """
+
+    start: datetime
+    minutes: int
+    histogram: dict[str, list[int]]
+
+    def __init__(self, start: datetime, minutes: int) -> None:
+        self.start = start
+        self.minutes = minutes
+        self.histogram = {}
+
+    def add(self, queue: str, minute: int, count: int = 1) -> None:
+        """Record task fires.
+
+        :param queue: queue name
+        :param minute: minute offset from start
+        :param count: number of fires
+        """
+        if 0 <= minute < self.minutes:
+            bins = self.histogram.get(queue)
+            if bins is None:
+                bins = self.histogram[queue] = [0] * self.minutes
+            bins[minute] += count
+
+    def totals(self) -> dict[str, int]:
+        """Get total fires per queue.
+
+        :return: fire counts keyed by queue name
+        """
+        return {k: sum(v) for k, v in self.histogram.items()}
+
+    def hotspots(self, top: int = 10) -> list[tuple[datetime, str, int]]:
+        """Get busiest minutes across all queues.
+
+        :param top: number of hotspots
+        :return: (minute, queue, fire count) sorted by fire count
+        """
+        items = (
+            (count, queue, minute)
+            for queue, bins in self.histogram.items()
+            for minute, count in enumerate(bins) if count
+        )
+        return [
+            (self.start + timedelta(minutes=minute), queue, count)
+            for count, queue, minute in heapq.nlargest(top, items)
+        ]
+
+    def as_dict(self, top: int = 10) -> dict[str, Any]:
+        """Dump forecast as JSON-compatible dict."""
+        return {
+            'start': self.start.isoformat(),
+            'minutes': self.minutes,
+            'totals': self.totals(),
+            'histogram': self.histogram,
+            'hotspots': [
+                {'minute': t.isoformat(), 'queue': q, 'count': c}
+                for t, q, c in self.hotspots(top)
+            ],
+        }
+
+
+def forecast_load(
+        hours: int | float = 24,
+        now: datetime | None = None,
+        default_queue: str | None = None,
+) -> LoadForecast:
+    """Forecast per-minute task fires of all enabled periodic tasks.
+
+    Tasks are grouped by queue and schedule so that fire times are computed
+    once per distinct schedule rather than once per task.
+
+    :param hours: forecast horizon in hours
+    :param now: optional naive UTC start time, defaults to current time
+    :param default_queue: optional queue of tasks without queue
+    :return: load forecast
+    """
+    now = now or datetime.utcnow()
+    start = now.replace(second=0, microsecond=0)
+    end = now + timedelta(hours=hours)
+    forecast = LoadForecast(start, int((end - start).total_seconds()) // 60)
+    default_queue = default_queue or celery_app.conf.task_default_queue
+
+    intervals: Counter[tuple[str, int, int]] = Counter()
+    crontabs: Counter[tuple[str, CronSpec, int]] = Counter()
+    solars: Counter[tuple[str, str, float, float, int]] = Counter()
+
+    for row in db.session.execute(_forecast_query()):
+        queue = row.queue or default_queue
+        start_at = local_to_utc(row.start_at) if row.start_at else None
+
+        if row.seconds:
+            last = local_to_utc(row.last_run_at) if row.last_run_at else now
+            period = int(row.seconds)
+            first = max(last + timedelta(seconds=period), now)
+            if start_at and start_at > first:
+                first = start_at
+            offset = int((first - start).total_seconds())
+            intervals[(queue, period, offset)] += 1
+        elif row.minute is not None:
+            spec = (row.minute, row.hour, row.day_of_week,
+                    row.day_of_month, row.month_of_year)
+            crontabs[(queue, spec, _minute_index(start, start_at))] += 1
+        elif row.event is not None:
+            key = (queue, row.event, float(row.latitude),
+                   float(row.longitude), _minute_index(start, start_at))
+            solars[key] += 1
+
+    horizon = int((end - start).total_seconds())
+    for (queue, period, offset), count in intervals.items():
+        for second in range(offset, horizon, period):
+            forecast.add(queue, second // 60, count)
+
+    tz = pytz.timezone(current_app.config['CELERY_TIMEZONE'])
+    crontab_minutes: dict[CronSpec, list[int]] = {}
+    for (queue, spec, skip), count in crontabs.items():
+        if spec not in crontab_minutes:
+            crontab_minutes[spec] = _crontab_minutes(spec, tz, start, end)
+        for minute in crontab_minutes[spec]:
+            if minute >= skip:
+                forecast.add(queue, minute, count)
+
+    for (queue, event, lat, lon, skip), count in solars.items():
+        schedule = solar_cache.schedule(event, lat, lon)
+        for moment in solar_cache.events(schedule, now, end):
+            minute = _minute_index(start, moment)
+            if minute >= skip:
+                forecast.add(queue, minute, count)
+
+    return forecast
+
+
+def next_fire_times(
+        task: PeriodicTask,
+        count: int = 10,
+        now: datetime | None = None,
+) -> list[datetime]:
+    """Get upcoming fire times of periodic task.
+
+    Fire times are expanded the same way as in :func:`forecast_load`, over a
+    horizon doubled until enough fire times are found.
+
+    :param task: periodic task
+    :param count: number of fire times
+    :param now: optional naive UTC start time, defaults to current time
+    :return: aware fire times
+    """
+    if count <= 0 or task.schedule is None:
+        return []
+    now = now or datetime.utcnow()
+    start = now.replace(second=0, microsecond=0)
+    start_at = local_to_utc(task.start_at) if task.start_at else None
+    skip = start_at.replace(second=0, microsecond=0) if start_at else start
+    tz = pytz.timezone(current_app.config['CELERY_TIMEZONE'])
+
+    rv: list[datetime] = []
+    if task.interval:
+        period = timedelta(seconds=task.interval.seconds)
+        last = local_to_utc(task.last_run_at) if task.last_run_at else now
+        first = max(last + period, now)
+        if start_at and start_at > first:
+            first = start_at
+        rv = [first + period * i for i in range(count)]
+    else:
+        window = timedelta(days=1)
+        begin = start if task.crontab else now
+        while len(rv) < count and begin < now + MAX_HORIZON:
+            end = begin + window
+            rv.extend(
+                moment for moment in _fire_times(task, tz, begin, end)
+                if moment >= skip
+            )
+            begin = end
+            window *= 2
+    return [pytz.utc.localize(x).astimezone(tz) for x in rv[:count]]
+
+
+def _fire_times(
+        task: PeriodicTask,
+        tz: Any,
+        start: datetime,
+        end: datetime,
+) -> list[datetime]:
+    """Get fire times of crontab or solar task within ``[start, end)``."""
+    if task.crontab:
+        c = task.crontab
+        spec = (c.minute, c.hour, c.day_of_week, c.day_of_month,
+                c.month_of_year)
+        return [start + timedelta(minutes=minute)
+                for minute in _crontab_minutes(spec, tz, start, end)]
+    return solar_cache.events(task.schedule, start, end)
+
+
+def _forecast_query() -> Any:
+    """Select schedule fields of enabled periodic tasks."""
+    t = PeriodicTask.__table__
+    c = CrontabSchedule.__table__
+    i = IntervalSchedule.__table__
+    s = SolarSchedule.__table__
+
+    return select(
+        t.c.queue, t.c.last_run_at, t.c.start_at,
+        i.c.seconds,
+        c.c.minute, c.c.hour, c.c.day_of_week, c.c.day_of_month,
+        c.c.month_of_year,
+        s.c.event, s.c.latitude, s.c.longitude,
+    ).select_from(
+        t.outerjoin(i, t.c.interval_id == i.c.id)
+        .outerjoin(c, t.c.crontab_id == c.c.id)
+        .outerjoin(s, t.c.solar_id == s.c.id)
+    ).where(t.c.is_enabled.is_(True))
+
+
+def _minute_index(start: datetime, moment: datetime | None) -> int:
+    """Get minute offset of naive UTC time from forecast start."""
+    if moment is None:
+        return 0
+    return int((moment - start).total_seconds()) // 60
+
+
+def _crontab_minutes(
+        spec: CronSpec,
+        tz: Any,
+        start: datetime,
+        end: datetime,
+) -> list[int]:
+    """Expand crontab spec to minute offsets within ``[start, end)``."""
+    cron = schedules.crontab(*spec)
+    hours = sorted(cron.hour)
+    minutes = sorted(cron.minute)
+
+    rv: list[int] = []
+    local_start = pytz.utc.localize(start).astimezone(tz).date()
+    local_end = pytz.utc.localize(end).astimezone(tz).date()
+    for day in _date_range(local_start, local_end):
+        if (day.month not in cron.month_of_year
+                or day.day not in cron.day_of_month
+                or day.isoweekday() % 7 not in cron.day_of_week):
+            continue
+        for hour in hours:
+            for minute in minutes:
+                moment = tz.localize(
+                    datetime(day.year, day.month, day.day, hour, minute))
+                moment = moment.astimezone(pytz.utc).replace(tzinfo=None)
+                if start <= moment < end:
+                    rv.append(_minute_index(start, moment))
+    return rv
+
+
+def _date_range(first: Any, last: Any) -> Iterable[Any]:
+    """Iterate dates from first to last inclusive."""
+    while first <= last:
+        yield first
+        first += timedelta(days=1)
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import time
+from datetime import datetime
+from datetime import timedelta
+from typing import Any
+
+from flask import Flask
+from redis import Redis
+from sqlalchemy import func
+from sqlalchemy import select
+
+from fcb.app import db
+from fcb.models import PeriodicTaskLease
+
+__all__ = [
+    'LEASE_HEADER', 'OVERLAP_LIMITS',
+    'LeaseStore', 'DatabaseLeaseStore', 'RedisLeaseStore', 'init_app',
+]
+
+#: Message header carrying the periodic task name of a leased run
+LEASE_HEADER = 'periodic_task'
+
+#: Maximum number of active runs per overlap policy
+OVERLAP_LIMITS: dict[str, int | None] = {
+    'allow': None,
+    'skip': 1,
+    'queue_one': 2,
+}
+
+
+class LeaseStore:
+    """Abstract store of periodic task run leases.
+
+    A lease is taken by BEAT for every dispatched run of a periodic task with
+    an overlap policy, and released by the worker when the run finishes or
+    expires on its own after its TTL.
+    """
+
+    def acquire(self, name: str, task_id: str, limit: int, ttl: int) -> bool:
+        """Acquire a run lease.
+
+        :param name: periodic task name
+        :param task_id: Celery task id of the run
+        :param limit: maximum number of active leases
+        :param ttl: lease expiration in seconds
+        :return: whether the lease was acquired
+        """
+        raise NotImplementedError()
+
+    def release(self, name: str, task_id: str) -> None:
+        """Release a run lease.
+
+        :param name: periodic task name
+        :param task_id: Celery task id of the run
+        """
+        raise NotImplementedError()
+
+    def release_request(self, request: Any) -> None:
+        """Release lease of a Celery task request, if any.
+
+        :param request: Celery task request
+        """
+        name = _request_lease(request)
+        if name:
+            self.release(name, request.id)
+
+    def request_headers(self, request: Any) -> dict[str, Any]:
+        """Get lease header of a Celery task request, to carry into retries.
+
+        :param request: Celery task request
+        :return: message headers
+        """
+        name = _request_lease(request)
+        return {LEASE_HEADER: name} if name else {}
+
+
+class DatabaseLeaseStore(LeaseStore):
+    """Lease store backed by the ``periodic_task_lease`` table.
+
+    :param app: Flask application
+    """
+
+    def __init__(self, app: Flask) -> None:
+        self.app = app
+
+    def acquire(self, name: str, task_id: str, limit: int, ttl: int) -> bool:
+        t = PeriodicTaskLease.__table__
+        now = datetime.utcnow()
+        with db.get_engine(self.app).begin() as cnn:
+            cnn.execute(t.delete().where(t.c.name == name,
+                                         t.c.expires_at <= now))
+            count = cnn.execute(
+                select(func.count()).select_from(t).where(t.c.name == name)
+            ).scalar()
+            if count >= limit:
+                return False
+            cnn.execute(t.insert().values(
+                task_id=task_id, name=name,
+                expires_at=now + timedelta(seconds=ttl),
+            ))
+        return True
+
+    def release(self, name: str, task_id: str) -> None:
+        t = PeriodicTaskLease.__table__
+        with db.get_engine(self.app).begin() as cnn:
+            cnn.execute(t.delete().where(t.c.task_id == task_id))
+
+
+class RedisLeaseStore(LeaseStore):
+    """Lease store keeping a sorted set of run expirations per task.
+
+    :param url: Redis URL
+    :param prefix: optional key prefix
+    """
+
+    def __init__(self, url: str, prefix: str = 'fcb:lease:') -> None:
+        self.client = Redis.from_url(url)
+        self.prefix = prefix
+
+    def acquire(self, name: str, task_id: str, limit: int, ttl: int) -> bool:
+        key = self.prefix + name
+        now = time.time()
+        pipe = self.client.pipeline()
+        pipe.zremrangebyscore(key, '-inf', now)
+        pipe.zcard(key)
+        _, count = pipe.execute()
+        if count >= limit:
+            return False
+
+        pipe.zadd(key, {task_id: now + ttl})
+        pipe.expire(key, ttl)
+        pipe.execute()
+        return True
+
+    def release(self, name: str, task_id: str) -> None:
+        self.client.zrem(self.prefix + name, task_id)
+
+
+def _request_lease(request: Any) -> str | None:
+    """Get periodic task name leased by a Celery task request."""
+    headers = getattr(request, 'headers', None) or {}
+    return getattr(request, LEASE_HEADER, None) or headers.get(LEASE_HEADER)
+
+
+def init_app(app: Flask) -> None:
+    """Initialize lease store of Flask application.
+
+    :param app: Flask application
+    """
+    url = app.config.get('CELERY_BEAT_LEASE_URL')
+    store = RedisLeaseStore(url) if url else DatabaseLeaseStore(app)
+    app.extensions['leases'] = store
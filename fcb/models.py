@@ -1,22 +1,68 @@
 from __future__ import annotations
 
+import time
+from contextlib import contextmanager
 from datetime import datetime
 from datetime import timedelta
 from typing import Any
+from typing import Iterator
+from typing import TypeVar
 from uuid import uuid4
 
 from celery import schedules
+from flask import current_app
 from sqlalchemy import Table
 from sqlalchemy import event
+from sqlalchemy import func
 from sqlalchemy import inspect
 from sqlalchemy.engine import Connection
 from sqlalchemy.orm import Mapper
+from sqlalchemy.orm import Session
 
 from fcb.app import db
+from fcb.utils.solar import solar_cache
 from fcb.utils.sqltypes import GUID
 from fcb.utils.sqltypes import json_dict
 from fcb.utils.sqltypes import json_list
 
+T = TypeVar('T')
+
+#: Monotonic time of last schedule change written by this process
+_last_change_time: float = float('-inf')
+
+
+@contextmanager
+def read_session() -> Iterator[Session]:
+    """Session for schedule reads.
+
+    Reads go to the ``SQLALCHEMY_READ_BIND`` bind when configured, except
+    within ``SQLALCHEMY_READ_YOUR_WRITES`` seconds of a schedule change made
+    by this process, so that the process sees its own writes. Instances
+    loaded from the read bind are detached when the block exits.
+
+    :return: read session
+    """
+    bind = current_app.config.get('SQLALCHEMY_READ_BIND')
+    window = current_app.config.get('SQLALCHEMY_READ_YOUR_WRITES', 0)
+    if not bind or time.monotonic() - _last_change_time < window:
+        yield db.session
+        return
+
+    session = Session(bind=db.get_engine(bind=bind))
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def _read_first(model: type[T], **spec: Any) -> T | None:
+    """Get first matching instance through the read session."""
+    with read_session() as session:
+        instance = session.query(model).filter_by(**spec).first()
+    if instance is not None and inspect(instance).detached:
+        instance = db.session.merge(instance, load=False)
+    return instance
+
 
 class ModelSchedule:
     """Abstract model schedule."""
@@ -60,7 +106,7 @@ class CrontabSchedule(db.Model, ModelSchedule):
             'day_of_month': schedule._orig_day_of_month,
             'month_of_year': schedule._orig_month_of_year
         }
-        instance = cls.query.filter_by(**spec).first()
+        instance = _read_first(cls, **spec)
         if not instance:
             instance = cls(**spec)
         db.session.add(instance)
@@ -114,7 +160,7 @@ class IntervalSchedule(db.Model, ModelSchedule):
             period: str = 'seconds'
     ) -> IntervalSchedule:
         seconds = max(schedule.run_every.total_seconds(), 0)
-        instance = cls.query.filter_by(seconds=seconds).first()
+        instance = _read_first(cls, seconds=seconds)
         if not instance:
             instance = cls(every=seconds, period=period)
         db.session.add(instance)
@@ -153,7 +199,7 @@ class SolarSchedule(db.Model, ModelSchedule):
             'latitude': schedule.lat,
             'longitude': schedule.lon,
         }
-        instance = cls.query.filter_by(**spec).first()
+        instance = _read_first(cls, **spec)
         if not instance:
             instance = cls(**spec)
         db.session.add(instance)
@@ -162,7 +208,7 @@ class SolarSchedule(db.Model, ModelSchedule):
 
     @property
     def schedule(self) -> schedules.solar:
-        return schedules.solar(self.event, self.latitude, self.longitude)
+        return solar_cache.schedule(self.event, self.latitude, self.longitude)
 
     def __repr__(self) -> str:
         return '<{0} {1} {2} {3}>'.format(
@@ -195,6 +241,8 @@ class PeriodicTask(db.Model):
     is_enabled = db.Column(db.Boolean, default=True)
     last_run_at = db.Column(db.DateTime)
     total_run_count = db.Column(db.Integer, default=0)
+    total_skip_count = db.Column(db.Integer, default=0)
+    overlap_policy = db.Column(db.String(20), default='allow')
     remarks = db.Column(db.Text)
 
     task_name = db.Column(db.String(200))
@@ -226,6 +274,50 @@ class PeriodicTask(db.Model):
         elif self.solar:
             return self.solar.schedule
 
+    @classmethod
+    def increase_skip_count(cls, name: str) -> None:
+        """Count a skipped run of periodic task.
+
+        :param name: periodic task name
+        """
+        t: Table = cls.__table__
+        with db.engine.begin() as cnn:
+            cnn.execute(t.update().where(t.c.name == name).values(
+                total_skip_count=func.coalesce(t.c.total_skip_count, 0) + 1))
+
+    @classmethod
+    def record_run(cls, name: str, last_run_at: datetime) -> None:
+        """Record a run of periodic task.
+
+        :param name: periodic task name
+        :param last_run_at: run time, local time
+        """
+        t: Table = cls.__table__
+        with db.engine.begin() as cnn:
+            cnn.execute(t.update().where(t.c.name == name).values(
+                last_run_at=last_run_at,
+                total_run_count=func.coalesce(t.c.total_run_count, 0) + 1))
+
+
+class PeriodicTaskLease(db.Model):
+    """Lease held by an active periodic task run."""
+
+    __tablename__ = 'periodic_task_lease'
+
+    task_id = db.Column(db.String(155), primary_key=True)
+    name = db.Column(db.String(200), index=True)
+    expires_at = db.Column(db.DateTime)
+
+
+class TaskPayload(db.Model):
+    """Periodic task arguments stored by claim check."""
+
+    __tablename__ = 'task_payload'
+
+    digest = db.Column(db.String(64), primary_key=True)
+    payload = db.Column(db.LargeBinary)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 
 class PeriodicTasks(db.Model):
     """Periodic task metadata."""
@@ -241,7 +333,10 @@ class PeriodicTasks(db.Model):
 
         :return: timestamp
         """
-        instance = cls.query.get(1)
+        with read_session() as session:
+            instance = session.query(cls).get(1)
+        if not instance:
+            instance = cls.query.get(1)
         if not instance:
             instance = cls(id=1)
             db.session.add(instance)
@@ -293,7 +388,8 @@ def _automatic_refresh2(
         for name, attr in inspect(target).attrs.items():
             history = attr.history
             if name not in ['last_run_at',
-                            'total_run_count'] and history.deleted:
+                            'total_run_count',
+                            'total_skip_count'] and history.deleted:
                 return True
         return False
 
@@ -303,6 +399,9 @@ def _automatic_refresh2(
 
 def _update_changed_time(cnn: Connection) -> None:
     """Update task changed time."""
+    global _last_change_time
+    _last_change_time = time.monotonic()
+
     t: Table = PeriodicTasks.__table__
 
     rv = cnn.execute(t.select(t.c.id == 1)).fetchone()
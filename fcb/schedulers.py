@@ -1,8 +1,12 @@
 from __future__ import annotations
 
+import copy
+import os
+import threading
 from datetime import datetime
 from typing import Any
 from typing import Sequence
+from typing import cast
 
 import pytz
 from celery import Celery
@@ -10,22 +14,40 @@ from celery import current_app as celery_app
 from celery import schedules
 from celery.beat import ScheduleEntry
 from celery.beat import Scheduler
+from celery.beat import SchedulingError
+from celery.utils import uuid
 from celery.utils.log import get_logger
 from flask import current_app
 from kombu.utils.encoding import safe_repr
 from kombu.utils.encoding import safe_str
+from sqlalchemy import inspect
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 
 from fcb.app import db
+from fcb.claim_check import CLAIM_CHECK_HEADER
+from fcb.leases import LEASE_HEADER
+from fcb.leases import OVERLAP_LIMITS
 from fcb.models import CrontabSchedule
 from fcb.models import IntervalSchedule
 from fcb.models import ModelSchedule
 from fcb.models import PeriodicTask
 from fcb.models import PeriodicTasks
 from fcb.models import SolarSchedule
+from fcb.models import read_session
+from fcb.snapshot import ScheduleSnapshot
+from fcb.snapshot import capture_task
+from fcb.utils.dispatch import ShardedExecutor
+from fcb.utils.solar import solar_cache
 
 TS = tuple[type[schedules.BaseSchedule], type[ModelSchedule], str]
 
 DEFAULT_MAX_INTERVAL = 5  # seconds
+DEFAULT_SOLAR_CACHE_DAYS = 2
+DEFAULT_LEASE_TTL = 3600  # seconds
+DEFAULT_DISPATCH_QUEUE_SIZE = 100
 
 logger = get_logger(__name__)
 
@@ -41,6 +63,16 @@ def local_to_utc(dt: datetime) -> datetime:
     return local_dt.astimezone(pytz.utc).replace(tzinfo=None)
 
 
+def utc_to_local(dt: datetime) -> datetime:
+    """Convert aware datetime to local datetime.
+
+    :param dt: aware datetime
+    :return: local datetime
+    """
+    local = pytz.timezone(current_app.config['CELERY_TIMEZONE'])
+    return dt.astimezone(local).replace(tzinfo=None)
+
+
 class ModelEntry(ScheduleEntry):
     """Scheduler entry taken from database row."""
 
@@ -57,6 +89,7 @@ class ModelEntry(ScheduleEntry):
         :param app: optional Celery application
         """
         self.model = model
+        self.overlap_policy = model.overlap_policy
         app = app or celery_app._get_current_object()
         last_run_at = local_to_utc(model.last_run_at) if model.last_run_at \
             else app.now()
@@ -76,9 +109,11 @@ class ModelEntry(ScheduleEntry):
                 'expires': model.expires,
                 'priority': model.priority,
                 'shadow': model.name,
+                **self._compression_options(model, app),
             },
             app=app
         )
+        self.snapshot_row = capture_task(model)
 
     @classmethod
     def from_entry(
@@ -106,6 +141,16 @@ class ModelEntry(ScheduleEntry):
 
         return cls(instance, app=app)
 
+    @staticmethod
+    def _compression_options(
+            model: PeriodicTask,
+            app: Celery,
+    ) -> dict[str, Any]:
+        """Get message compression option of the task queue."""
+        compression = (app.conf.get('beat_queue_compression') or {}).get(
+            model.queue or app.conf.task_default_queue)
+        return {'compression': compression} if compression else {}
+
     @classmethod
     def to_model_schedule(
             cls,
@@ -178,11 +223,33 @@ class ModelEntry(ScheduleEntry):
         }
 
     def __next__(self) -> ModelEntry:
-        self.model.last_run_at = self.default_now()
-        self.model.total_run_count += 1
-        db.session.add(self.model)
+        model = self.model
+        if inspect(model).detached:
+            model = db.session.merge(model, load=False)
+        model.last_run_at = self.default_now()
+        model.total_run_count = PeriodicTask.total_run_count + 1
+        db.session.add(model)
         db.session.commit()
-        return self.__class__(self.model)
+        return self.__class__(model)
+
+    def advance(self) -> ModelEntry:
+        """Get next entry, recording the run on the loaded model only.
+
+        The run is expected to be written by :meth:`PeriodicTask.record_run`.
+
+        :return: next model entry
+        """
+        model = self.model
+        set_committed_value(model, 'last_run_at',
+                            utc_to_local(self.default_now()))
+        set_committed_value(model, 'total_run_count',
+                            (model.total_run_count or 0) + 1)
+        return self.__class__(model, app=self.app)
+
+    def __copy__(self) -> ModelEntry:
+        entry = self.__class__.__new__(self.__class__)
+        entry.__dict__.update(self.__dict__)
+        return entry
 
     def __repr__(self) -> str:
         return '<ModelEntry: {0} {1}(*{2}, **{3}) {4}>'.format(
@@ -201,6 +268,13 @@ class DatabaseScheduler(Scheduler):
     _last_timestamp: datetime | None = None
     _initial_read: bool = True
 
+    _snapshot: ScheduleSnapshot | None = None
+    _snapshot_loaded: bool = False
+    _loaded_at: datetime | None = None
+    _reconciler: threading.Thread | None = None
+    _reconciled: tuple[datetime | None, dict[str, ModelEntry]] | None = None
+    _dispatcher: ShardedExecutor | None = None
+
     def __init__(self, *args: Any, **kwargs: Any) -> None:
         Scheduler.__init__(self, *args, **kwargs)
         self.max_interval = (
@@ -215,15 +289,19 @@ class DatabaseScheduler(Scheduler):
         update = False
         if self._initial_read:
             logger.info('DatabaseScheduler: Initial read')
-            update = True
+            update = not self._read_snapshot()
             self._initial_read = False
 
+        elif self._reconciler is not None:
+            if not self._reconciler.is_alive():
+                self._finish_reconcile()
+
         elif self.schedule_changed():
             logger.info('DatabaseScheduler: Schedule changed')
             update = True
 
         if update:
-            self._schedule = self.all_as_schedule()
+            self._load_schedule()
 
         return self._schedule
 
@@ -234,12 +312,236 @@ class DatabaseScheduler(Scheduler):
         """
         logger.info('DatabaseScheduler: Fetching database schedule')
         s = {}
-        for model in self.Model.query.filter_by(is_enabled=True).all():
+        with read_session() as session:
+            query = session.query(self.Model).options(
+                joinedload(self.Model.crontab),
+                joinedload(self.Model.interval),
+                joinedload(self.Model.solar),
+            ).filter_by(is_enabled=True)
+            for model in query:
+                try:
+                    s[model.name] = self.Entry(model, app=self.app)
+                except ValueError:
+                    pass
+        solar_cache.precompute(
+            x.schedule for x in s.values()
+            if isinstance(x.schedule, schedules.solar)
+        )
+        return s
+
+    def _load_schedule(self) -> None:
+        """Load all model schedules from database."""
+        self._loaded_at = self._last_timestamp = PeriodicTasks.get_changed_at()
+        self._schedule = self.all_as_schedule()
+
+    def _read_snapshot(self) -> bool:
+        """Load schedule from snapshot.
+
+        :return: whether the snapshot was loaded
+        """
+        snapshot = self._snapshot
+        rv = snapshot.read() if snapshot else None
+        if snapshot is None or rv is None:
+            return False
+
+        self._loaded_at, models = rv
+        try:
+            self._refresh_runs(models)
+        except SQLAlchemyError as err:
+            logger.warning(f'Cannot read runs of schedule snapshot: {err!r}')
+            return False
+
+        s = {}
+        for model in models:
             try:
                 s[model.name] = self.Entry(model, app=self.app)
             except ValueError:
                 pass
-        return s
+        logger.info(f'DatabaseScheduler: Loaded {len(s)} entries from '
+                    f'snapshot {snapshot.path}')
+        self._schedule = s
+        self._snapshot_loaded = True
+        return True
+
+    def _refresh_runs(self, models: list[PeriodicTask]) -> None:
+        """Update snapshot models with runs recorded in database.
+
+        The snapshot is only written on sync, so runs recorded after it must
+        be read before the first tick to not fire them again.
+
+        :param models: detached periodic tasks
+        """
+        t = self.Model.__table__
+        runs = {
+            x.name: x for x in db.session.execute(
+                select(t.c.name, t.c.last_run_at, t.c.total_run_count))
+        }
+        for model in models:
+            run = runs.get(model.name)
+            if run is not None:
+                set_committed_value(model, 'last_run_at', run.last_run_at)
+                set_committed_value(model, 'total_run_count',
+                                    run.total_run_count)
+
+    def _start_reconcile(self) -> None:
+        """Reload schedule from database in background."""
+        app = cast(Any, current_app)._get_current_object()
+
+        def reconcile() -> None:
+            with app.app_context():
+                try:
+                    stamp = PeriodicTasks.get_changed_at()
+                    self._reconciled = stamp, self.all_as_schedule()
+                except Exception as err:
+                    logger.error(f'Cannot reconcile schedule snapshot: '
+                                 f'{err!r}')
+                finally:
+                    db.session.remove()
+
+        self._reconciler = threading.Thread(
+            target=reconcile, name='beat-reconcile', daemon=True)
+        self._reconciler.start()
+
+    def _finish_reconcile(self) -> None:
+        """Replace snapshot schedule with reconciled one."""
+        self._reconciler = None
+        if self._reconciled is None:
+            self._load_schedule()
+            return
+
+        (stamp, s), self._reconciled = self._reconciled, None
+        for name, entry in s.items():
+            # Keep entries that already ran after the background load.
+            current = self._schedule.get(name)
+            if current and current.total_run_count > entry.total_run_count:
+                s[name] = current
+        logger.info('DatabaseScheduler: Snapshot reconciled')
+        self._schedule = s
+        self._loaded_at = self._last_timestamp = stamp
+
+    def reserve(self, entry: ModelEntry) -> ModelEntry:
+        """Advance entry, writing its bookkeeping in the dispatch pool.
+
+        :param entry: model entry
+        :return: next model entry
+        """
+        if self._dispatcher is None:
+            return super().reserve(entry)
+
+        new_entry = self.schedule[entry.name] = entry.advance()
+        self._dispatcher.submit(entry.name, self.Model.record_run,
+                                entry.name, new_entry.model.last_run_at)
+        return new_entry
+
+    def apply_entry(self, entry: ModelEntry, producer: Any = None) -> None:
+        """Send task of entry, in the dispatch pool if enabled.
+
+        Pool threads publish through the Celery producer pool.
+
+        :param entry: model entry
+        :param producer: optional message producer
+        """
+        if self._dispatcher is None:
+            self._send_entry(entry, producer)
+        else:
+            self._dispatcher.submit(entry.name, self._send_entry, entry)
+
+    def _send_entry(self, entry: ModelEntry, producer: Any = None) -> None:
+        """Send task of entry, logging errors."""
+        logger.info(f'Scheduler: Sending due task {entry.name} '
+                    f'({entry.task})')
+        try:
+            result = self.apply_async(entry, producer=producer, advance=False)
+        except Exception as err:
+            logger.error(f'Message Error: {err!r}', exc_info=True)
+        else:
+            if result is not None:
+                logger.debug(f'{entry.task} sent. id->{result.id}')
+
+    def apply_async(
+            self,
+            entry: ModelEntry,
+            producer: Any = None,
+            advance: bool = True,
+            **kwargs: Any,
+    ) -> Any:
+        """Send task of entry, unless its overlap policy skips it.
+
+        Arguments above the claim check threshold are replaced with a
+        payload reference.
+
+        :param entry: model entry
+        :param producer: optional message producer
+        :param advance: whether to advance entry first
+        :return: async result, ``None`` if the run was skipped
+        """
+        entry = self.reserve(entry) if advance else entry
+        entry = self._claim_check(entry)
+
+        limit = OVERLAP_LIMITS.get(entry.overlap_policy or 'allow')
+        leases = current_app.extensions.get('leases')
+        if not limit or leases is None:
+            return self._send(entry, producer, **kwargs)
+
+        task_id = uuid()
+        ttl = (
+                entry.options.get('expires')
+                or self.app.conf.get('beat_lease_ttl')
+                or DEFAULT_LEASE_TTL
+        )
+        if not leases.acquire(entry.name, task_id, limit, ttl):
+            logger.info(f'DatabaseScheduler: Skipped {entry.name}, '
+                        f'previous run still active')
+            self.Model.increase_skip_count(entry.name)
+            return None
+
+        entry = copy.copy(entry)
+        entry.options = dict(entry.options, task_id=task_id, headers={
+            **(entry.options.get('headers') or {}),
+            LEASE_HEADER: entry.name,
+        })
+        try:
+            return self._send(entry, producer, **kwargs)
+        except Exception:
+            leases.release(entry.name, task_id)
+            raise
+
+    def _send(self, entry: ModelEntry, producer: Any, **kwargs: Any) -> Any:
+        """Send task of advanced entry.
+
+        Claim-checked entries are sent by name, as their empty arguments would
+        fail the argument check of registered tasks.
+        """
+        if CLAIM_CHECK_HEADER not in (entry.options.get('headers') or {}):
+            return super().apply_async(entry, producer, False, **kwargs)
+
+        try:
+            return self.send_task(entry.task, (), {}, producer=producer,
+                                  **entry.options)
+        except Exception as err:
+            raise SchedulingError(f"Couldn't apply scheduled task "
+                                  f'{entry.name}: {err}') from err
+        finally:
+            self._tasks_since_sync += 1
+            if self.should_sync():
+                self._do_sync()
+
+    @staticmethod
+    def _claim_check(entry: ModelEntry) -> ModelEntry:
+        """Replace large arguments of entry with a payload reference."""
+        claim_check = current_app.extensions.get('claim_check')
+        digest = claim_check.check(entry.args, entry.kwargs) \
+            if claim_check is not None else None
+        if digest is None:
+            return entry
+
+        entry = copy.copy(entry)
+        entry.args, entry.kwargs = (), {}
+        entry.options = dict(entry.options, headers={
+            **(entry.options.get('headers') or {}),
+            CLAIM_CHECK_HEADER: digest,
+        })
+        return entry
 
     def install_default_entries(self, data: dict[str, Any]) -> None:
         """Install default BEAT schedules.
@@ -272,9 +574,66 @@ class DatabaseScheduler(Scheduler):
 
     def setup_schedule(self) -> None:
         """Setup BEAT schedule."""
+        solar_cache.days = (
+                self.app.conf.get('beat_solar_cache_days')
+                or DEFAULT_SOLAR_CACHE_DAYS
+        )
+        filename = self.app.conf.get('beat_snapshot_filename')
+        if filename:
+            path = os.path.join(current_app.instance_path, filename)
+            self._snapshot = ScheduleSnapshot(path)
+
+        workers = self.app.conf.get('beat_dispatch_workers') or 0
+        if workers > 0:
+            app = cast(Any, current_app)._get_current_object()
+            self._dispatcher = ShardedExecutor(
+                workers,
+                maxsize=self.app.conf.get('beat_dispatch_queue_size')
+                or DEFAULT_DISPATCH_QUEUE_SIZE,
+                context=app.app_context,
+                name='beat-dispatch',
+            )
+
         self.install_default_entries(self.schedule)
         self.update_from_dict(self.app.conf.beat_schedule)
 
+        if self._snapshot_loaded:
+            self._start_reconcile()
+
+    def close(self) -> None:
+        """Drain dispatch pool and write schedule snapshot."""
+        if self._dispatcher is not None:
+            self._dispatcher.shutdown()
+            self._dispatcher = None
+        super().close()
+
+    def sync(self) -> None:
+        """Prune claim check payloads & write schedule snapshot."""
+        self._prune_payloads()
+        if self._snapshot is None or self._reconciler is not None:
+            return
+
+        rows = [x.snapshot_row for x in list(self._schedule.values())]
+        try:
+            self._snapshot.write(self._loaded_at, rows)
+        except OSError as err:
+            logger.warning(f'Cannot write schedule snapshot: {err!r}')
+
+    def _prune_payloads(self) -> None:
+        """Delete claim check payloads no longer referenced."""
+        claim_check = current_app.extensions.get('claim_check')
+        if claim_check is None:
+            return
+        try:
+            count = claim_check.prune(
+                (x.args, x.kwargs) for x in list(self._schedule.values()))
+        except (OSError, SQLAlchemyError) as err:
+            logger.warning(f'Cannot prune claim check payloads: {err!r}')
+            return
+        if count:
+            logger.info(f'DatabaseScheduler: Pruned {count} claim check '
+                        f'payloads')
+
     def update_from_dict(self, dict_: dict[str, Any]) -> None:
         """Update BEAT schedule from task settings.
 
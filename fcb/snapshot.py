@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+from datetime import datetime
+from decimal import Decimal
+from typing import Any
+from typing import Iterable
+from uuid import UUID
+
+from celery.utils.log import get_logger
+from sqlalchemy import DateTime
+from sqlalchemy import Numeric
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from fcb.models import CrontabSchedule
+from fcb.models import IntervalSchedule
+from fcb.models import PeriodicTask
+from fcb.models import SolarSchedule
+from fcb.utils.sqltypes import GUID
+
+__all__ = [
+    'ScheduleSnapshot', 'capture_task',
+]
+
+SNAPSHOT_VERSION = 1
+
+logger = get_logger(__name__)
+
+_schedule_models: dict[str, type[Any]] = {
+    'crontab': CrontabSchedule,
+    'interval': IntervalSchedule,
+    'solar': SolarSchedule,
+}
+
+
+def capture_task(model: PeriodicTask) -> dict[str, Any]:
+    """Capture loaded column values of periodic task and its schedule.
+
+    Values are kept as they are, encoding is deferred to
+    :meth:`ScheduleSnapshot.write`.
+
+    :param model: loaded periodic task
+    :return: raw row values
+    """
+    row = _capture(model)
+    for field in _schedule_models:
+        target = getattr(model, field)
+        if target is not None:
+            row[field] = _capture(target)
+    return row
+
+
+class ScheduleSnapshot:
+    """On-disk snapshot of BEAT schedule.
+
+    The snapshot is a single JSON document holding every enabled periodic
+    task with its schedule, stamped with the ``PeriodicTasks.changed_at``
+    it was built from.
+
+    :param path: snapshot file path
+    """
+
+    path: str
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def read(self) -> tuple[datetime | None, list[PeriodicTask]] | None:
+        """Read snapshot.
+
+        :return: snapshot stamp & detached periodic tasks, ``None`` if
+            snapshot is missing or unreadable
+        """
+        try:
+            with open(self.path, 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != SNAPSHOT_VERSION:
+                return None
+            stamp = data['changed_at']
+            models = [_load_task(x) for x in data['tasks']]
+        except FileNotFoundError:
+            return None
+        except Exception as err:
+            logger.warning(f'Cannot read schedule snapshot {self.path}: '
+                           f'{err!r}')
+            return None
+
+        return datetime.fromisoformat(stamp) if stamp else None, models
+
+    def write(
+            self,
+            changed_at: datetime | None,
+            rows: Iterable[dict[str, Any]],
+    ) -> None:
+        """Write snapshot atomically.
+
+        :param changed_at: schedule changed time the rows were loaded at
+        :param rows: rows captured by :func:`capture_task`
+        """
+        data = {
+            'version': SNAPSHOT_VERSION,
+            'changed_at': changed_at.isoformat() if changed_at else None,
+            'tasks': [_dump_task(x) for x in rows],
+        }
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wt', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+def _capture(instance: Any) -> dict[str, Any]:
+    """Capture loaded column values."""
+    loaded = inspect(instance).dict
+    return {
+        c.key: loaded[c.key] for c in instance.__table__.columns
+        if c.key in loaded
+    }
+
+
+def _dump_task(row: dict[str, Any]) -> dict[str, Any]:
+    """Encode captured periodic task row."""
+    rv = _encode(PeriodicTask, row)
+    for field, model in _schedule_models.items():
+        if field in row:
+            rv[field] = _encode(model, row[field])
+    return rv
+
+
+def _load_task(data: dict[str, Any]) -> PeriodicTask:
+    """Build detached periodic task from encoded row."""
+    task = _decode(PeriodicTask, data)
+    for field, model in _schedule_models.items():
+        setattr(task, field, _decode(model, data[field])
+                if field in data else None)
+    make_transient_to_detached(task)
+    return task
+
+
+def _encode(model: type[Any], row: dict[str, Any]) -> dict[str, Any]:
+    """Encode row values as JSON-compatible values."""
+    rv = {}
+    for column in model.__table__.columns:
+        if column.key not in row:
+            continue
+        value = row[column.key]
+        if isinstance(value, UUID):
+            value = value.hex
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = str(value)
+        rv[column.key] = value
+    return rv
+
+
+def _decode(model: type[Any], data: dict[str, Any]) -> Any:
+    """Build detached instance from encoded row values."""
+    values = {}
+    for column in model.__table__.columns:
+        if column.key not in data:
+            # Written before the column was added, load from database.
+            raise ValueError(f'Missing column {column.key}')
+        value = data[column.key]
+        if value is not None:
+            if isinstance(column.type, GUID):
+                value = UUID(value)
+            elif isinstance(column.type, DateTime):
+                value = datetime.fromisoformat(value)
+            elif isinstance(column.type, Numeric):
+                value = Decimal(value)
+        values[column.key] = value
+
+    instance = model(**values)
+    if model is not PeriodicTask:
+        make_transient_to_detached(instance)
+    return instance
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from contextlib import AbstractContextManager
+from contextlib import nullcontext
+from typing import Any
+from typing import Callable
+
+from celery.utils.log import get_logger
+
+__all__ = [
+    'ShardedExecutor',
+]
+
+logger = get_logger(__name__)
+
+
+class ShardedExecutor:
+    """Pool of single-thread workers, each draining its own bounded queue.
+
+    Jobs submitted with the same key run on the same worker in submission
+    order, and submitting blocks while that worker's queue is full.
+
+    :param workers: number of worker threads
+    :param maxsize: maximum number of queued jobs per worker
+    :param context: optional context manager factory wrapping each worker
+    :param name: thread name prefix
+    """
+
+    def __init__(
+            self,
+            workers: int,
+            maxsize: int = 100,
+            context: Callable[[], AbstractContextManager[Any]] | None = None,
+            name: str = 'dispatch',
+    ) -> None:
+        self.context = context or nullcontext
+        self._queues: list[queue.Queue[Any]] = [
+            queue.Queue(maxsize) for _ in range(workers)
+        ]
+        self._threads = [
+            threading.Thread(target=self._run, args=(q,), name=f'{name}-{i}',
+                             daemon=True)
+            for i, q in enumerate(self._queues)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def submit(
+            self,
+            key: str,
+            fn: Callable[..., Any],
+            *args: Any,
+            **kwargs: Any,
+    ) -> None:
+        """Queue a job on the worker of key.
+
+        :param key: ordering key
+        :param fn: job function
+        :param args: job positional arguments
+        :param kwargs: job keyword arguments
+        """
+        q = self._queues[hash(key) % len(self._queues)]
+        q.put((fn, args, kwargs))
+
+    def shutdown(self, timeout: float | None = None) -> None:
+        """Run queued jobs and stop workers.
+
+        :param timeout: optional seconds to wait for workers
+        """
+        for q in self._queues:
+            q.put(None)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for t in self._threads:
+            t.join(None if deadline is None
+                   else max(0.0, deadline - time.monotonic()))
+
+    def _run(self, q: queue.Queue[Any]) -> None:
+        """Run jobs of a queue until stopped."""
+        with self.context():
+            while True:
+                job = q.get()
+                if job is None:
+                    break
+                fn, args, kwargs = job
+                try:
+                    fn(*args, **kwargs)
+                except Exception as err:
+                    logger.error(f'Dispatch job {fn!r} failed: {err!r}',
+                                 exc_info=True)
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import cProfile
+import os
+import random
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Iterable
+from typing import Iterator
+
+from celery.utils.log import get_logger
+from flask import Flask
+
+__all__ = [
+    'TaskProfiler',
+]
+
+PROFILE_MODES = frozenset(['cpu', 'memory'])
+
+logger = get_logger(__name__)
+
+_TRACE_FILTERS = [
+    tracemalloc.Filter(False, cProfile.__file__),
+    tracemalloc.Filter(False, tracemalloc.__file__),
+]
+
+
+class TaskProfiler:
+    """Sampled profiler of task invocations.
+
+    Sampled invocations are run under cProfile and/or tracemalloc, and their
+    profiles are written to a folder whose total size is kept under a limit
+    by removing the oldest files.
+
+    :param folder: profile folder
+    :param rate: fraction of invocations to profile
+    :param tasks: optional names of tasks to profile on every invocation
+    :param modes: optional profilers to run, ``cpu`` and/or ``memory``
+    :param max_bytes: maximum total size of profile folder
+    :param top: number of allocation sites in memory profiles
+    """
+
+    def __init__(
+            self,
+            folder: str,
+            rate: float = 0.0,
+            tasks: Iterable[str] = (),
+            modes: Iterable[str] = ('cpu',),
+            max_bytes: int = 50 * 1024 * 1024,
+            top: int = 50,
+    ) -> None:
+        self.folder = folder
+        self.rate = rate
+        self.tasks = frozenset(tasks)
+        self.modes = PROFILE_MODES.intersection(modes)
+        self.max_bytes = max_bytes
+        self.top = top
+        self._lock = threading.Lock()
+        self._tracers = 0
+
+    @classmethod
+    def from_app(cls, app: Flask) -> TaskProfiler | None:
+        """Create profiler from Flask application configurations.
+
+        :param app: Flask application
+        :return: profiler, ``None`` if profiling is disabled
+        """
+        rate = app.config.get('CELERY_TASK_PROFILE_RATE') or 0.0
+        tasks = app.config.get('CELERY_TASK_PROFILE_TASKS') or ()
+        if not rate and not tasks:
+            return None
+
+        folder = app.config.get('CELERY_TASK_PROFILE_FOLDER') or 'profiles'
+        return cls(
+            os.path.join(app.instance_path, folder),
+            rate=rate,
+            tasks=tasks,
+            modes=app.config.get('CELERY_TASK_PROFILE_MODES') or ('cpu',),
+            max_bytes=app.config.get('CELERY_TASK_PROFILE_MAX_BYTES')
+            or 50 * 1024 * 1024,
+        )
+
+    def should_sample(self, name: str) -> bool:
+        """Whether to profile an invocation of task.
+
+        :param name: task name
+        :return: boolean
+        """
+        return name in self.tasks or random.random() < self.rate
+
+    @contextmanager
+    def profile(self, name: str, task_id: str | None) -> Iterator[None]:
+        """Profile the wrapped invocation.
+
+        :param name: task name
+        :param task_id: optional task id
+        """
+        profiler = cProfile.Profile() if 'cpu' in self.modes else None
+        baseline = self._start_tracing() if 'memory' in self.modes else None
+        started = time.time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            stem = '{0}-{1}-{2}'.format(
+                time.strftime('%Y%m%dT%H%M%S', time.localtime(started)),
+                name, task_id or 'local',
+            )
+            try:
+                self._write(stem, profiler, baseline)
+            except Exception as err:
+                logger.warning(f'Cannot write profile {stem}: {err!r}')
+            finally:
+                if baseline is not None:
+                    self._stop_tracing()
+
+    def _write(
+            self,
+            stem: str,
+            profiler: cProfile.Profile | None,
+            baseline: tracemalloc.Snapshot | None,
+    ) -> None:
+        """Write profile files and rotate profile folder."""
+        if baseline is not None:
+            snapshot = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+            baseline = baseline.filter_traces(_TRACE_FILTERS)
+            stats = snapshot.compare_to(baseline, 'lineno')
+
+        os.makedirs(self.folder, exist_ok=True)
+        path = os.path.join(self.folder, stem)
+        written = set()
+        if profiler is not None:
+            profiler.dump_stats(path + '.prof')
+            written.add(path + '.prof')
+        if baseline is not None:
+            with open(path + '.mem.txt', 'wt', encoding='utf-8') as f:
+                f.writelines(f'{x}\n' for x in stats[:self.top])
+            written.add(path + '.mem.txt')
+        self._rotate(written)
+
+    def _rotate(self, keep: set[str]) -> None:
+        """Remove oldest profile files above size limit.
+
+        :param keep: paths of just written profile files, never removed
+        """
+        files: list[tuple[float, int, str]] = []
+        total = 0
+        for entry in os.scandir(self.folder):
+            if entry.is_file():
+                stat = entry.stat()
+                total += stat.st_size
+                if entry.path not in keep:
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _start_tracing(self) -> tracemalloc.Snapshot:
+        """Start shared tracemalloc session and take a baseline snapshot."""
+        with self._lock:
+            if self._tracers == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._tracers = 1
+            elif self._tracers:
+                self._tracers += 1
+        return tracemalloc.take_snapshot()
+
+    def _stop_tracing(self) -> None:
+        """Stop shared tracemalloc session after last user."""
+        with self._lock:
+            if self._tracers:
+                self._tracers -= 1
+                if self._tracers == 0:
+                    tracemalloc.stop()
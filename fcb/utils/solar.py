@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left
+from bisect import bisect_right
+from datetime import datetime
+from datetime import timedelta
+from decimal import Decimal
+from typing import Any
+from typing import Iterable
+
+from celery import schedules
+from celery.utils.time import localize
+from celery.utils.time import timezone
+
+__all__ = [
+    'SolarEventCache', 'cached_solar', 'solar_cache',
+]
+
+SolarKey = tuple[str, float, float]
+
+DAY = timedelta(days=1)
+
+#: Events this close to a lookup time are taken as the same event
+EVENT_TOLERANCE = timedelta(minutes=1)
+
+
+def _solar_key(
+        event: str,
+        latitude: float | Decimal,
+        longitude: float | Decimal,
+) -> SolarKey:
+    return event, float(latitude), float(longitude)
+
+
+class SolarEventCache:
+    """Day-granular cache of solar event times.
+
+    Event times are naive UTC datetimes keyed by (event, latitude, longitude)
+    and shared by every schedule with the same key, so ephem only runs when
+    a key is first seen or its precomputed window runs out.
+
+    :param days: number of upcoming days to precompute
+    """
+
+    def __init__(self, days: int = 2) -> None:
+        self.days = days
+        self._schedules: dict[SolarKey, cached_solar] = {}
+        self._events: dict[SolarKey, list[datetime]] = {}
+        self._windows: dict[SolarKey, tuple[datetime, datetime]] = {}
+        self._lock = threading.RLock()
+
+    def schedule(
+            self,
+            event: str,
+            latitude: float | Decimal,
+            longitude: float | Decimal,
+    ) -> cached_solar:
+        """Get shared solar schedule instance.
+
+        :param event: solar event name
+        :param latitude: observer latitude
+        :param longitude: observer longitude
+        :return: Celery solar schedule using this cache
+        """
+        key = _solar_key(event, latitude, longitude)
+        with self._lock:
+            instance = self._schedules.get(key)
+            if instance is None:
+                instance = cached_solar(event, latitude, longitude, cache=self)
+                self._schedules[key] = instance
+            return instance
+
+    def next_event(
+            self,
+            schedule: schedules.solar,
+            after: datetime,
+    ) -> datetime | None:
+        """Get first cached event after given time.
+
+        Events within :data:`EVENT_TOLERANCE` after ``after`` are taken as the
+        event that ran at ``after``.
+
+        :param schedule: Celery solar schedule
+        :param after: naive UTC datetime
+        :return: naive UTC event time, ``None`` if no event in the window
+        """
+        key = _solar_key(schedule.event, schedule.lat, schedule.lon)
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or not window[0] <= after < window[1] - DAY:
+                self._fill(key, schedule, after)
+            events = self._events[key]
+            index = bisect_right(events, after + EVENT_TOLERANCE)
+            return events[index] if index < len(events) else None
+
+    def events(
+            self,
+            schedule: schedules.solar,
+            start: datetime,
+            end: datetime,
+    ) -> list[datetime]:
+        """Get cached events within ``[start, end)``.
+
+        :param schedule: Celery solar schedule
+        :param start: naive UTC datetime
+        :param end: naive UTC datetime
+        :return: naive UTC event times
+        """
+        key = _solar_key(schedule.event, schedule.lat, schedule.lon)
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or window[0] > start or window[1] < end:
+                day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+                days = max((end - day).days + 1, self.days)
+                self._fill(key, schedule, start, days=days)
+            events = self._events[key]
+            return events[bisect_left(events, start):bisect_left(events, end)]
+
+    def precompute(
+            self,
+            items: Iterable[schedules.solar],
+            now: datetime | None = None,
+    ) -> None:
+        """Precompute upcoming events of given schedules.
+
+        :param items: Celery solar schedules
+        :param now: optional naive UTC datetime, defaults to current time
+        """
+        now = now or datetime.utcnow()
+        for schedule in items:
+            self.next_event(schedule, now)
+
+    def clear(self) -> None:
+        """Drop all cached events."""
+        with self._lock:
+            self._events.clear()
+            self._windows.clear()
+
+    def _fill(
+            self,
+            key: SolarKey,
+            schedule: schedules.solar,
+            after: datetime,
+            days: int | None = None,
+    ) -> None:
+        """Cover the day of ``after`` and upcoming days in the window.
+
+        A window overlapping the requested days is extended rather than
+        replaced, so that event times already handed out stay the same, as
+        ephem results differ by milliseconds between runs.
+        """
+        start = after.replace(hour=0, minute=0, second=0, microsecond=0)
+        end = start + DAY * ((days or self.days) + 1)
+        window = self._windows.get(key)
+        if window is None or start > window[1] or end < window[0]:
+            self._events[key] = self._compute(schedule, start, end)
+            self._windows[key] = (start, end)
+            return
+
+        events = self._events[key]
+        if start < window[0]:
+            events = self._compute(schedule, start, window[0]) + events
+        if end > window[1]:
+            events = events + self._compute(schedule, window[1], end)
+        self._events[key] = events
+        self._windows[key] = (min(start, window[0]), max(end, window[1]))
+
+    @staticmethod
+    def _compute(
+            schedule: schedules.solar,
+            start: datetime,
+            end: datetime,
+    ) -> list[datetime]:
+        """Compute events within ``[start, end)``."""
+        sun = schedule.ephem.Sun()
+        method = getattr(schedule.cal, schedule.method)
+        options: dict[str, Any] = {'use_center': True} \
+            if schedule.use_center else {}
+
+        events: list[datetime] = []
+        cursor = start
+        while cursor < end:
+            try:
+                moment = method(sun, start=cursor, **options).datetime()
+            except schedule.ephem.CircumpolarError:
+                # Sun won't rise/set today, look again tomorrow.
+                cursor += DAY
+                continue
+            if moment >= end:
+                break
+            events.append(moment)
+            cursor = moment + EVENT_TOLERANCE
+        return events
+
+
+class cached_solar(schedules.solar):
+    """Solar schedule reading event times from a :class:`SolarEventCache`.
+
+    :param event: solar event name
+    :param lat: observer latitude
+    :param lon: observer longitude
+    :param cache: optional event cache, defaults to shared cache
+    """
+
+    def __init__(
+            self,
+            event: str,
+            lat: float | Decimal,
+            lon: float | Decimal,
+            cache: SolarEventCache | None = None,
+            **kwargs: Any,
+    ) -> None:
+        super().__init__(event, lat, lon, **kwargs)
+        self.cache = cache or solar_cache
+
+    def remaining_estimate(self, last_run_at: datetime) -> timedelta:
+        last_run_at = self.maybe_make_aware(last_run_at)
+        after = localize(last_run_at, timezone.utc).replace(tzinfo=None)
+        moment = self.cache.next_event(self, after)
+        if moment is None:
+            return super().remaining_estimate(last_run_at)
+
+        return self.maybe_make_aware(moment) - \
+            self.maybe_make_aware(self.now())
+
+
+#: Shared solar event cache
+solar_cache = SolarEventCache()
@@ -0,0 +1,57 @@
+import hashlib
+from typing import Any
+from typing import Iterator
+
+import pytest
+from flask import Flask
+
+from fcb.app import create_app
+from fcb.app import db
+
+
+def _create_app(tmp_path: Any, **config: Any) -> Flask:
+    return create_app('testing', {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path}/fcb.db',
+        'CELERY_BROKER_URL': 'memory://',
+        'CELERY_BEAT_SCHEDULE': {},
+        'CELERY_BEAT_SNAPSHOT_FILENAME': None,
+        **config,
+    }, instance_path=str(tmp_path))
+
+
+@pytest.fixture()
+def app(tmp_path: Any) -> Iterator[Flask]:
+    app = _create_app(tmp_path, API_ENABLED=True)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+def test_api_disabled_by_default(tmp_path: Any) -> None:
+    app = _create_app(tmp_path)
+    assert app.test_client().get('/api/periodic-tasks').status_code == 404
+
+
+def test_listing_leaves_out_arguments(app: Flask) -> None:
+    from fcb.claim_check import encode_arguments
+    from fcb.models import IntervalSchedule
+    from fcb.models import PeriodicTask
+
+    db.session.add(PeriodicTask(
+        name='with_secret', task_name='tests.noop',
+        task_args=['token'], task_kwargs={'password': 'hunter2'},
+        interval=IntervalSchedule(every=5, period='seconds'),
+    ))
+    db.session.commit()
+
+    response = app.test_client().get('/api/periodic-tasks')
+    assert response.status_code == 200
+    assert b'hunter2' not in response.data
+
+    (item,) = response.get_json()['items']
+    payload = encode_arguments(['token'], {'password': 'hunter2'})
+    assert item['arguments'] == {
+        'size': len(payload),
+        'digest': hashlib.sha256(payload).hexdigest(),
+    }
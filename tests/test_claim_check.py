@@ -0,0 +1,124 @@
+from typing import Any
+from typing import Iterator
+
+import pytest
+from flask import Flask
+
+from fcb.app import create_app
+from fcb.app import db
+from fcb.app import tq
+
+
+@pytest.fixture()
+def app(tmp_path: Any) -> Iterator[Flask]:
+    app = create_app('testing', {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path}/fcb.db',
+        'CELERY_BROKER_URL': 'memory://',
+        'CELERY_BEAT_SCHEDULE': {},
+        'CELERY_BEAT_SNAPSHOT_FILENAME': None,
+        'CELERY_CLAIM_CHECK_THRESHOLD': 100,
+    }, instance_path=str(tmp_path))
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+def test_claim_checked_task_with_required_arguments(app: Flask) -> None:
+    from fcb.models import IntervalSchedule
+    from fcb.models import PeriodicTask
+    from fcb.schedulers import DatabaseScheduler
+
+    @tq.celery.task(name='tests.needs_arg')
+    def needs_arg(payload: str) -> int:
+        return len(payload)
+
+    db.session.add(PeriodicTask(
+        name='needs_arg', task_name='tests.needs_arg',
+        task_args=['x' * 5000],
+        interval=IntervalSchedule(every=5, period='seconds'),
+    ))
+    db.session.commit()
+
+    scheduler = DatabaseScheduler(app=tq.celery)
+    result = scheduler.apply_async(scheduler.schedule['needs_arg'])
+    assert result is not None
+
+    with tq.celery.connection_for_write() as conn:
+        message = conn.SimpleQueue('celery').get(timeout=1)
+    args, kwargs, _ = message.payload
+    digest = message.headers['claim_check']
+    assert (args, kwargs) == ([], {})
+    assert PeriodicTask.query.filter_by(name='needs_arg').one() \
+        .total_run_count == 1
+
+    app.extensions['claim_check']._cache.clear()
+    applied = needs_arg.apply(headers={'claim_check': digest})
+    assert applied.get() == 5000
+
+
+def test_retry_keeps_claim_check_header(app: Flask) -> None:
+    from celery.exceptions import Retry
+
+    from fcb.claim_check import CLAIM_CHECK_HEADER
+
+    @tq.celery.task(name='tests.flaky_with_arg')
+    def flaky_with_arg(payload: str) -> None:
+        pass
+
+    # Workers expose custom message headers as request attributes.
+    flaky_with_arg.push_request(
+        id='run-1', args=[], kwargs={}, retries=0, headers=None,
+        called_directly=False,
+        delivery_info={'exchange': '', 'routing_key': 'celery'},
+        **{CLAIM_CHECK_HEADER: 'f' * 64},
+    )
+    try:
+        with pytest.raises(Retry):
+            flaky_with_arg.retry(countdown=60)
+    finally:
+        flaky_with_arg.pop_request()
+
+    with tq.celery.connection_for_write() as conn:
+        message = conn.SimpleQueue('celery').get(timeout=1)
+    assert message.payload[0] == []
+    assert message.headers[CLAIM_CHECK_HEADER] == 'f' * 64
+
+
+@pytest.mark.parametrize('folder', [None, 'payloads'])
+def test_prune_unreferenced_payloads(
+        app: Flask,
+        folder: str | None,
+) -> None:
+    import os
+    import time
+    from datetime import datetime
+    from datetime import timedelta
+
+    from fcb.claim_check import ClaimCheck
+    from fcb.claim_check import DatabasePayloadStore
+    from fcb.claim_check import FilePayloadStore
+    from fcb.models import TaskPayload
+
+    store = FilePayloadStore(os.path.join(app.instance_path, folder)) \
+        if folder else DatabasePayloadStore(app)
+    claim_check = ClaimCheck(store, threshold=10, expires=3600)
+    kept = claim_check.check(['kept' * 10], {})
+    stale = claim_check.check(['stale' * 10], {})
+    fresh = claim_check.check(['fresh' * 10], {})
+    assert kept and stale and fresh
+
+    old = datetime.utcnow() - timedelta(hours=2)
+    for digest in (kept, stale):
+        if folder:
+            os.utime(store._path(digest), (time.time() - 7200,) * 2)
+        else:
+            TaskPayload.query.filter_by(digest=digest) \
+                .update({'created_at': old})
+            db.session.commit()
+
+    assert claim_check.prune([(['kept' * 10], {})]) == 1
+    assert store.get(kept) is not None
+    assert store.get(stale) is None
+    assert store.get(fresh) is not None
+    assert claim_check.prune([]) == 0
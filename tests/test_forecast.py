@@ -0,0 +1,79 @@
+from datetime import datetime
+from datetime import timedelta
+from typing import Any
+from typing import Iterator
+
+import pytest
+import pytz
+from flask import Flask
+
+from fcb.app import create_app
+from fcb.app import db
+
+
+@pytest.fixture()
+def app(tmp_path: Any) -> Iterator[Flask]:
+    app = create_app('testing', {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path}/fcb.db',
+        'CELERY_BROKER_URL': 'memory://',
+        'CELERY_BEAT_SCHEDULE': {},
+        'CELERY_BEAT_SNAPSHOT_FILENAME': None,
+    }, instance_path=str(tmp_path))
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+def _forecast_times(hours: int, now: datetime) -> list[datetime]:
+    from fcb.forecast import forecast_load
+
+    forecast = forecast_load(hours=hours, now=now)
+    (bins,) = forecast.histogram.values()
+    return [forecast.start + timedelta(minutes=minute)
+            for minute, count in enumerate(bins) for _ in range(count)]
+
+
+def test_crontab_fire_times_within_hour(app: Flask) -> None:
+    from fcb.forecast import next_fire_times
+    from fcb.models import CrontabSchedule
+    from fcb.models import PeriodicTask
+
+    task = PeriodicTask(
+        name='every_5_min_after_midnight', task_name='tests.noop',
+        crontab=CrontabSchedule(minute='*/5', hour='0'),
+    )
+    db.session.add(task)
+    db.session.commit()
+
+    tz = pytz.timezone(app.config['CELERY_TIMEZONE'])
+    now = tz.localize(datetime(2026, 10, 19, 12)) \
+        .astimezone(pytz.utc).replace(tzinfo=None)
+    rv = next_fire_times(task, count=14, now=now)
+
+    assert [(x.hour, x.minute) for x in rv[:3]] == [(0, 0), (0, 5), (0, 10)]
+    assert rv[12].day == rv[0].day + 1
+    assert [x.astimezone(pytz.utc).replace(tzinfo=None) for x in rv] == \
+        _forecast_times(48, now)[:14]
+
+
+def test_solar_fire_times_match_forecast(app: Flask) -> None:
+    from fcb.forecast import next_fire_times
+    from fcb.models import PeriodicTask
+    from fcb.models import SolarSchedule
+
+    task = PeriodicTask(
+        name='sunrise', task_name='tests.noop',
+        solar=SolarSchedule(event='sunrise', latitude=31.2, longitude=121.5),
+    )
+    db.session.add(task)
+    db.session.commit()
+
+    now = datetime(2026, 10, 19, 6)
+    rv = [x.astimezone(pytz.utc).replace(tzinfo=None)
+          for x in next_fire_times(task, count=5, now=now)]
+
+    gaps = [b - a for a, b in zip(rv, rv[1:])]
+    assert all(timedelta(hours=23) < x < timedelta(hours=25) for x in gaps)
+    assert [x.replace(second=0, microsecond=0) for x in rv] == \
+        _forecast_times(24 * 5, now)
@@ -0,0 +1,51 @@
+from typing import Any
+from typing import Iterator
+
+import pytest
+from celery.exceptions import Retry
+from flask import Flask
+
+from fcb.app import create_app
+from fcb.app import db
+from fcb.app import tq
+
+
+@pytest.fixture()
+def app(tmp_path: Any) -> Iterator[Flask]:
+    app = create_app('testing', {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path}/fcb.db',
+        'CELERY_BROKER_URL': 'memory://',
+        'CELERY_BEAT_SCHEDULE': {},
+        'CELERY_BEAT_SNAPSHOT_FILENAME': None,
+    }, instance_path=str(tmp_path))
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+def test_retry_keeps_lease_header(app: Flask) -> None:
+    from fcb.leases import LEASE_HEADER
+
+    @tq.celery.task(name='tests.flaky')
+    def flaky() -> None:
+        pass
+
+    # Workers expose custom message headers as request attributes.
+    flaky.push_request(
+        id='run-1', args=[], kwargs={}, retries=0, headers=None,
+        called_directly=False,
+        delivery_info={'exchange': '', 'routing_key': 'celery'},
+        **{LEASE_HEADER: 'flaky_task'},
+    )
+    try:
+        with pytest.raises(Retry):
+            flaky.retry(countdown=60)
+    finally:
+        flaky.pop_request()
+
+    with tq.celery.connection_for_write() as conn:
+        message = conn.SimpleQueue('celery').get(timeout=1)
+    assert message.headers['id'] == 'run-1'
+    assert message.headers['retries'] == 1
+    assert message.headers[LEASE_HEADER] == 'flaky_task'
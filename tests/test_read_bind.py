@@ -0,0 +1,88 @@
+import time
+from typing import Any
+from typing import Iterator
+
+import pytest
+from flask import Flask
+from sqlalchemy import inspect
+
+from fcb.app import create_app
+from fcb.app import db
+from fcb.app import tq
+
+
+@pytest.fixture()
+def app(tmp_path: Any) -> Iterator[Flask]:
+    app = create_app('testing', {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path}/fcb.db',
+        'SQLALCHEMY_BINDS': {'replica': f'sqlite:///{tmp_path}/replica.db'},
+        'SQLALCHEMY_READ_BIND': 'replica',
+        'SQLALCHEMY_READ_YOUR_WRITES': 60,
+        'CELERY_BROKER_URL': 'memory://',
+        'CELERY_BEAT_SCHEDULE': {},
+        'CELERY_BEAT_SNAPSHOT_FILENAME': None,
+    }, instance_path=str(tmp_path))
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture()
+def replicated(app: Flask, monkeypatch: Any) -> None:
+    """Add a task on the primary and a copy lagging behind on the replica."""
+    from fcb.models import IntervalSchedule
+    from fcb.models import PeriodicTask
+
+    db.session.add(PeriodicTask(
+        name='replicated', task_name='tests.noop', total_run_count=3,
+        interval=IntervalSchedule(every=5, period='seconds'),
+    ))
+    db.session.commit()
+
+    primary = db.get_engine()
+    replica = db.get_engine(bind='replica')
+    db.Model.metadata.create_all(replica)
+    with primary.connect() as src, replica.begin() as dst:
+        for table in db.Model.metadata.sorted_tables:
+            rows = [dict(x._mapping) for x in src.execute(table.select())]
+            if rows:
+                dst.execute(table.insert(), rows)
+        t = PeriodicTask.__table__
+        dst.execute(t.update().values(total_run_count=1))
+    monkeypatch.setattr('fcb.models._last_change_time', float('-inf'))
+
+
+def _entry() -> Any:
+    from fcb.schedulers import DatabaseScheduler
+
+    scheduler = DatabaseScheduler(app=tq.celery, lazy=True)
+    return scheduler.all_as_schedule()['replicated']
+
+
+@pytest.mark.usefixtures('replicated')
+def test_reads_come_from_replica_detached() -> None:
+    entry = _entry()
+    assert entry.total_run_count == 1
+    assert inspect(entry.model).detached
+
+
+@pytest.mark.usefixtures('replicated')
+def test_next_counts_run_on_primary() -> None:
+    from fcb.models import PeriodicTask
+
+    entry = next(_entry())
+    assert not inspect(entry.model).detached
+
+    db.session.expire_all()
+    model = PeriodicTask.query.filter_by(name='replicated').one()
+    assert model.total_run_count == 4
+    assert model.last_run_at is not None
+
+
+@pytest.mark.usefixtures('replicated')
+def test_reads_follow_own_writes(monkeypatch: Any) -> None:
+    monkeypatch.setattr('fcb.models._last_change_time', time.monotonic())
+    entry = _entry()
+    assert entry.total_run_count == 3
+    assert not inspect(entry.model).detached
@@ -0,0 +1,57 @@
+from datetime import timedelta
+from typing import Any
+from typing import Iterator
+
+import pytest
+from flask import Flask
+
+from fcb.app import create_app
+from fcb.app import db
+from fcb.app import tq
+
+
+@pytest.fixture()
+def app(tmp_path: Any) -> Iterator[Flask]:
+    app = create_app('testing', {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path}/fcb.db',
+        'CELERY_BROKER_URL': 'memory://',
+        'CELERY_BEAT_SCHEDULE': {},
+        'CELERY_BEAT_SNAPSHOT_FILENAME': 'beat-snapshot.json',
+    }, instance_path=str(tmp_path))
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+def test_restart_from_older_snapshot_does_not_refire(app: Flask) -> None:
+    from fcb.models import CrontabSchedule
+    from fcb.models import PeriodicTask
+    from fcb.schedulers import DatabaseScheduler
+
+    now = tq.celery.now().replace(tzinfo=None)
+    fire_at = now - timedelta(hours=1)
+    db.session.add(PeriodicTask(
+        name='daily', task_name='tests.noop',
+        last_run_at=now - timedelta(days=2),
+        crontab=CrontabSchedule(minute=str(fire_at.minute),
+                                hour=str(fire_at.hour)),
+    ))
+    db.session.commit()
+
+    scheduler = DatabaseScheduler(app=tq.celery)
+    assert scheduler.schedule['daily'].is_due().is_due
+    scheduler.sync()
+
+    # Today's run is committed, then beat stops before the next sync.
+    next(scheduler.schedule['daily'])
+
+    restarted = DatabaseScheduler(app=tq.celery)
+    try:
+        assert restarted._snapshot_loaded
+        entry = restarted.schedule['daily']
+        assert entry.total_run_count == 1
+        assert not entry.is_due().is_due
+    finally:
+        if restarted._reconciler is not None:
+            restarted._reconciler.join()
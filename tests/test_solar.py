@@ -0,0 +1,34 @@
+from datetime import datetime
+from datetime import timedelta
+from typing import Any
+
+from fcb.utils.solar import SolarEventCache
+
+
+def test_next_event_chain_across_refills() -> None:
+    cache = SolarEventCache(days=1)
+    schedule = cache.schedule('sunrise', 31.2, 121.5)
+
+    moment = datetime(2026, 10, 19)
+    seen = []
+    for _ in range(10):
+        moment = cache.next_event(schedule, moment)
+        seen.append(moment)
+
+    gaps = [b - a for a, b in zip(seen, seen[1:])]
+    assert all(timedelta(hours=23) < x < timedelta(hours=25) for x in gaps)
+
+
+def test_alternating_lookups_keep_window(monkeypatch: Any) -> None:
+    cache = SolarEventCache(days=1)
+    schedule = cache.schedule('sunset', 31.2, 121.5)
+    first = cache.next_event(schedule, datetime(2026, 10, 19))
+    later = cache.next_event(schedule, datetime(2026, 10, 21))
+
+    def fail(*args: Any, **kwargs: Any) -> Any:
+        raise AssertionError('window recomputed')
+
+    monkeypatch.setattr(cache, '_compute', fail)
+    for _ in range(3):
+        assert cache.next_event(schedule, datetime(2026, 10, 19)) == first
+        assert cache.next_event(schedule, datetime(2026, 10, 21)) == later